@@ -1,10 +1,5 @@
 import builtins
-import glob
-import importlib
 import os
-import sys
-from collections import defaultdict
-from pathlib import Path
 from typing import Optional
 
 from skidl import KICAD, Net, set_backup_lib, set_default_tool
@@ -12,9 +7,12 @@ from skidl import KICAD, Net, set_backup_lib, set_default_tool
 from skidl import pyspice
 from .base import Block
 from .builder import Build
+from .namespace import install_finder
+from .registry import registry
+from .session import Session, current_session, install
 from .stockman import Stockman
 from .utils import merge
-from .utils.args import is_tolerated, u
+from .utils.args import is_tolerated, u, u_array
 
 set_backup_lib('.')
 set_default_tool(KICAD)
@@ -23,86 +21,45 @@ builtins.SIMULATION = False
 builtins.DEBUG = True
 builtins.TEMPLATE = 'TEMPLATE'
 
+# Refs and notes are grabbed from caller source code by default,
+# production builds could pass them explicitly and skip frames inspection
+builtins.INSPECT = os.getenv('BEM_INSPECT', '1') != '0'
+
+# Flags and default circuit are resolved from current build session
+install()
+
 
 def get_created_blocks(block_type: Optional[str]):
     blocks = {}
 
-    for pair in Block.scope:
-        if issubclass(pair[1].__class__, block_type or Block):
-            block = pair[1]
-            blocks[block.ref] = block
+    for block in Block.scope.blocks_of_type(block_type or Block):
+        blocks[block.ref] = block
 
     return blocks
 
 
 def bem_scope(root='./blocks'):
-    blocks = defaultdict(dict)
-
-    # Get Blocks from current root scopes
-    if os.path.isdir(root):
-        scopes = [ name for name in os.listdir(root) if os.path.isdir(os.path.join(root, name)) ]
-        scopes = [ name for name in scopes if name[0].islower() ]
-    else:
+    if not os.path.isdir(root):
         return {}
 
-    for scope in scopes:
-        # Get Blocks from current root
-        scope_root = root + '/' + scope
-        for file in glob.glob(scope_root + '/*/__init__.py'):
-            tail = file.split('/')
-            element = tail[-2]
-            if not element[0].isupper():
-                continue
-
-            blocks[scope][element] = defaultdict(list)
-
-            for mod_type, mod_value in [(mod.split('/')[-2], mod.split('/')[-1]) for mod in glob.glob(scope_root + '/%s/_*/*.py' % element)]:
-                if mod_value.find('_test.py') != -1:
-                    continue
-
-                mod_type = mod_type[1:]
-                mod_value = mod_value.replace('.py', '')
-
-                blocks[scope][element][mod_type].append(mod_value)
-
-            blocks[scope][element] = dict(blocks[scope][element])
+    return registry(root).scope()
 
-        inner_blocks = bem_scope(scope_root)
-        blocks[scope] = {
-            **blocks[scope],
-            **inner_blocks
-        }
 
-    return dict(blocks)
-
-
-def bem_scope_module(scopes, root=''):
-    blocks = defaultdict(dict)
-
-    # Get Blocks from current root scopes
-    scopes_keys = [ name for name in scopes.keys() if name[0].islower() ]
-    blocks_keys = [ name for name in scopes.keys() if name[0].isupper() ]
-
-    for scope in scopes_keys:
-        bem_scope_module(scopes[scope], '.'.join([root, scope]))
-
-    for block in blocks_keys:
-        def build(name=root[1:] + '.' + block, *arg, **kwarg):
-            return Build(name, *arg, **kwarg).block
-
-        blocks[block] = build
+module_blocks = os.path.dirname(__file__) + '/blocks/'
 
-    if root:
-        sys.modules[__name__ + root] = type(root, (object,), blocks)
+# Blocks available as `bem.<scope>.<Block>` and resolved on first access
+install_finder(__name__, [module_blocks, './blocks'])
 
-module_blocks = os.path.dirname(__file__) + '/blocks/'
 
-bem_scope_dict = merge(
-    bem_scope(module_blocks),
-    bem_scope()
-)
+def __getattr__(name):
+    # Full scope of available blocks is expensive, build it only on demand
+    if name == 'bem_scope_dict':
+        return merge(
+            bem_scope(module_blocks),
+            bem_scope()
+        )
 
-bem_scope_module(bem_scope_dict)
+    raise AttributeError("module '%s' has no attribute '%s'" % (__name__, name))
 
 
 from PySpice.Unit import _build_unit_shortcut, u_Degree
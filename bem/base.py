@@ -1,26 +1,31 @@
-from inspect import currentframe, getargspec, getmembers, isroutine
-from os import path
-from sys import _getframe, setprofile
+from hashlib import sha1
+from inspect import currentframe
+from sys import _getframe
 from types import FunctionType
 from typing import List, Set, Dict, Tuple, Optional
 
 from codenamize import codenamize
 
-from .utils.args import parse_arguments, value_to_round, value_to_strict
-from .utils.logger import logger_init, block_params
-from .utils.parser import (block_params_description, inspect_code,
-                           inspect_comments, inspect_ref)
+from .scope import Scope
+from .session import SessionAttribute
+from .utils.args import (copy_argument, mount_plan, parse_arguments, value_to_round,
+                         value_to_strict)
+from .utils.frames import register_caller
+from .utils.logger import block_params, code_anchor, log_enabled, logger_init
+from .utils.structer import freeze_mods, sorted_mods
+from .utils.parser import (NoteRef, block_params_description, inspect_code,
+                           inspect_ref, resolve_notes)
 
 log = logger_init(__name__)
 
 
 class Block:
-    # Reference to global BEM scope
-    scope = []
+    # Reference to BEM scope of current build session
+    scope: Scope = SessionAttribute()
 
     # Current active block
-    owner = [None]
-    refs: List[str] = []
+    owner: List['Block'] = SessionAttribute()
+    refs: List[str] = SessionAttribute()
 
     # Sources used in block building
     files: List[str] = ['bem/base.py']
@@ -34,43 +39,67 @@ class Block:
     # Methods that used for parameters description extraction
     doc_methods: List[str] = ['willMount', 'circuit']
 
+    # Properties resolved on access, skipped in params and pins lookup
+    lazy_params: List[str] = ['notes', 'identity']
+
     def __init__(self, *args, **kwargs):
         # Build scope
         # Previous block, if they didn't release, owner of current
         if not len(self.scope):
             self.root = True
 
-        self.scope.append((self.owner[-1], self))
+        self._owner = self.owner[-1]
+        # Position between blocks of the same owner, siblings without ref differ by it
+        self._ordinal = len(self.scope.children_of(self._owner))
+        self.scope.append((self._owner, self))
         self.owner.append(self)
 
-        self.notes: List[str] = []
-        self.__pretty_name = None
-
-        # Disable tracing
-        # Tracing usage also in: abastract/Electrical/__init__.py
-        setprofile(None)
-
-        # Grab name of variable used for instance of this Block
-        # Traversal through call stack frames for search the same instance
-        deph = 0
-        ref: str = None
-        while ref is None:
-            frame = _getframe(deph)
-            context = inspect_code(self, frame)
-            ref = context['ref']
-
-            if context.get('comment_line_start', None) is not None:
-                self.notes = inspect_comments(
-                    context['source'],
-                    context['comment_line_start'],
-                    context['comment_line_end'])
-
+        self._notes: List = []
+        self._signature: Optional[tuple] = None
+        self._identity: Optional[Tuple[tuple, str]] = None
+        self._pretty_name: Optional[Tuple[str, str]] = None
+
+        # Composed class is shared between instances
+        self.props = {**getattr(self, 'props', {})}
+
+        if INSPECT:
+            # Grab name of variable used for instance of this Block
+            # Traversal through call stack frames for search the same instance
+            register_caller()
+
+            ref = None
+            deph = 0
+            while ref is None:
+                frame = _getframe(deph)
+                context = inspect_code(self, frame)
+                ref = context['ref']
+
+                if context.get('comment_line_start', None) is not None:
+                    self._notes = [NoteRef(
+                        context['source'],
+                        context['comment_line_start'],
+                        context['comment_line_end'])]
+
+                self.context = {
+                    'caller': context['caller'],
+                    'code': context['code']
+                }
+
+                deph += 1
+
+            # Variable name or locals of caller code
+            caller_locals = ref if isinstance(ref, dict) else {}
+        else:
+            # Without inspection refs and notes are passed explicitly
+            # or generated from block name, caller is the owner block
+            self.notes = list(kwargs.get('notes', None) or [])
             self.context = {
-                'caller': context['caller'],
-                'code': context['code']
+                'caller': self.owner[-2],
+                'code': ''
             }
 
-            deph += 1
+            # Caller locals aren't known, V is taken from the owner block
+            caller_locals = {}
 
         # Assign passed or assigned property to Block
         arguments = getattr(self, 'arguments', {})
@@ -85,8 +114,8 @@ class Block:
         # Default V and Load from caller Block
         caller = self.context['caller']
         if not kwargs.get('V', False) and (hasattr(caller, 'V')
-                                           or ref.get('V', None)):
-            V_parent = ref.get('V', caller and caller.V)
+                                           or caller_locals.get('V', None)):
+            V_parent = caller_locals.get('V', caller and caller.V)
             self.V = kwargs['V'] = V_parent
 
         if not kwargs.get('Load', False) and hasattr(caller, 'Load'):
@@ -95,6 +124,8 @@ class Block:
         # Do all building routines
         self.mount(*args, **kwargs)
 
+        self._signature = self.signature()
+
         # Some difference in arguments saving
         for arg in arguments.keys():
             is_default_argument_method = isinstance(getattr(self, arg), FunctionType)
@@ -107,9 +138,47 @@ class Block:
                 value = kwargs[arg](self)
                 setattr(self, arg, value)
 
+    @property
+    def notes(self) -> List[str]:
+        """
+        Comments from source resolved on first access, by exporters
+        """
+        return resolve_notes(self._notes, unique=True)
+
+    @notes.setter
+    def notes(self, notes: List):
+        self._notes = list(notes)
+
+    def signature(self) -> tuple:
+        return (getattr(self, 'name', ''),
+                freeze_mods(getattr(self, 'mods', {})),
+                sorted_mods(getattr(self, 'props', {})))
+
+    @property
+    def identity(self) -> str:
+        """
+        Stable hash of hierarchy path, ref, position between siblings
+        and build signature, the same for the same design in different runs
+        """
+        owner = getattr(self, '_owner', None)
+        path = owner.identity if isinstance(owner, Block) else ''
+
+        # Signature is fixed after mount, until that it's taken as is
+        signature = getattr(self, '_signature', None) or self.signature()
+
+        # Ref is assigned on release, hash is updated only when it or path changed
+        key = (path, str(getattr(self, 'ref', '')), getattr(self, '_ordinal', 0), signature)
+        cached = getattr(self, '_identity', None)
+        if cached is None or cached[0] != key:
+            self._identity = (key, sha1(repr(key).encode('utf-8')).hexdigest()[:16])
+
+        return self._identity[1]
+
     def __str__(self):
-        if hasattr(self, '__pretty_name'):
-            return self.__pretty_name
+        identity = self.identity
+        cached = getattr(self, '_pretty_name', None)
+        if cached is not None and cached[0] == identity:
+            return cached[1]
 
         name: List[str] = []
         for word in getattr(self, 'name', '').split('.'):
@@ -123,12 +192,12 @@ class Block:
             name.append(' '.join([key.capitalize()] + [str(el).capitalize()
                                                        for el in value]))
 
-        block_name: str = codenamize(id(self), 0)
+        block_name: str = codenamize(identity, 0)
         name.append('#' + block_name)
 
-        self.__pretty_name = ' '.join(name)
+        self._pretty_name = (identity, ' '.join(name))
 
-        return self.__pretty_name
+        return self._pretty_name[1]
 
     def __repr__(self):
         return str(self)
@@ -137,32 +206,27 @@ class Block:
         pass
 
     def mount(self, *args, **kwargs):
-        # Last class is object
-        classes = getattr(self, 'classes', [])
-        classes = classes[:-1]
-        # FIXME: Clear builder duplicates
-        classes = [cls for cls in classes if 'builder' not in str(cls)]
+        plan = vars(type(self)).get('mount_plan', None)
+        if plan is None:
+            plan = self.__class__.mount_plan = mount_plan(self) if hasattr(self, 'classes') else []
+
         # Call .willMount from all inherited classes
-        for cls in classes:
-            if hasattr(cls, 'willMount'):
-                mount_args_keys = getargspec(cls.willMount).args
-                # TODO: Why we are copy arguments
-                mount_kwargs = kwargs.copy()
-                if len(mount_args_keys) == 1:
-                    args = []
-
-                mount_args = {key: value.copy() if hasattr(value, 'copy') else value for key, value in mount_kwargs.items()
-                              if key in mount_args_keys}
-                cls.willMount(self, *args, **mount_args)
-
-        if DEBUG:
+        for mount, keys, positional in plan:
+            mount_args = {key: copy_argument(kwargs[key]) for key in keys if key in kwargs}
+
+            if positional:
+                mount(self, *args, **mount_args)
+            else:
+                mount(self, **mount_args)
+
+        if log_enabled(log):
             self.log(' ; '.join([key + '=' + str(getattr(self, key))
                                  for key, value in kwargs.items()]))
 
     def release(self):
         self.owner.pop()
 
-        if DEBUG:
+        if log_enabled(log):
             self.log(block_params(self) + '\n')
 
     def finish(self):
@@ -173,17 +237,12 @@ class Block:
         raise raise_type(message)
 
     def log(self, message, *args):
-        if not DEBUG:
+        if not log_enabled(log):
             return
 
         # Get the previous frame in the stack, otherwise it would
         # be this function
-        func = currentframe().f_back.f_code
-        anchor = "[%s:%i:%s] - " % (
-            path.basename(path.dirname(func.co_filename)) + '/' + path.basename(func.co_filename),
-            func.co_firstlineno,
-            func.co_name
-        )
+        anchor = code_anchor(currentframe().f_back.f_code)
 
         log.info(("%30s" % anchor) + str(self) + ' - ' + str(message), *args)
 
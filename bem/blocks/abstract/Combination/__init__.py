@@ -1,22 +1,19 @@
-import inspect
+from collections import OrderedDict
 
 import numpy as np
 from PySpice import Spice
-from PySpice.Unit import FrequencyValue, PeriodValue, SiUnits
+from PySpice.Unit import FrequencyValue, PeriodValue
 from PySpice.Unit.Unit import UnitValue
 
 from skidl import Net
 from bem import Block, u
+from bem.utils.args import range_values
+from bem.utils.values import ValueIndex, synthesize
 from bem.abstract import Physical
 from ..Physical import raise_part_unavailable
 from bem.model import Param
 from copy import copy
 
-si_units = inspect.getmembers(SiUnits, lambda a: not (inspect.isroutine(a)))
-prefixes = {prefix[1].PREFIX: prefix[1].POWER for prefix in si_units if hasattr(prefix[1], 'PREFIX')}
-prefixes['u'] = prefixes['μ']
-prefixes['0'] = 0
-
 
 class Base:
     inherited = Physical
@@ -56,19 +53,24 @@ class Base:
         suited_parts = []
 
         error = 5
-        max_error = u(self.value) * error / 100
+        value = u(self.value)
+        max_error = value * error / 100
         min_error = None
         min_error_part = None
 
         for part in available_parts:
-            for value in part_values(part, self.value):
-                if value == self.value:
-                    suited_parts.append(part)
+            values = part_values(part)
+            if not len(values):
+                continue
+
+            errors = np.abs(values - value)
+            if not errors.all():
+                suited_parts.append(part)
 
-                error = abs(u(value) - u(self.value))
-                if min_error == None or min_error > error:
-                    min_error = error
-                    min_error_part = part
+            error = errors.min()
+            if min_error == None or min_error > error:
+                min_error = error
+                min_error_part = part
 
         if len(suited_parts) == 0:
             if max_error > min_error and min_error_part:
@@ -81,173 +83,134 @@ class Base:
         return suited_parts
 
     def circuit(self):
-        # Closest
-
-        value = None
-        if not self.props.get('virtual_part', False):
-            available_values = block_values(self)
-            value = value_closest(available_values, self.value)
-            # FIXME: Test brokens but if disabled schematics with raw value
-            if hasattr(value, "canonise"):
-                value = value.canonise()
-                # FIXME: 4.7 kOhm not properly round for example
-#                value._value = round(value.value)
-        else:
-            value = self.value
-
-        self.value = value
-
-        return super().circuit(value=value)
-
-        # TODO: Wrong implementation
-
-        if SIMULATION:
-            Builder = self.part_spice
+        if self.props.get('virtual_part', False):
+            return super().circuit(value=self.value)
+
+        index = block_index(self)
+
+        # Parts are combined only if `tolerance` prop is set and the closest value is out of it
+        tolerance = self.props.get('tolerance', None)
+        if isinstance(tolerance, list):
+            tolerance = tolerance[0]
+
+        combination = None
+        if tolerance is not None:
+            combination = synthesize(index, self.value, tolerance=float(tolerance))
+
+        if combination is None:
+            value = value_closest(index, self.value)
+            combination = (value, value)
+
+        value, tree = combination
+        # FIXME: Test brokens but if disabled schematics with raw value
+        self.value = value_unit(value, self.value) if value is not None else None
+        # FIXME: 4.7 kOhm not properly round for example
+
+        if isinstance(tree, tuple):
+            # Block is composed from inner blocks like any other block without own part,
+            # parts are placed, exported and simulated by them
+            self.element = None
+            self.combination = self.combine(tree, self.input, self.output)
+
+            return
+
+        return super().circuit(value=self.value)
+
+    def combine(self, tree, input, output):
+        """
+        Connect inner blocks of the same type by combination tree
+        between `input` and `output` nets, return the inner blocks
+        """
+        if not isinstance(tree, tuple):
+            part = self.__class__(value=value_unit(tree, self.value))
+            input += part.input
+            output += part.output
+
+            return [part]
+
+        operation, items = tree
+        blocks = []
+        # Resistors are summed in series, capacitors in parallel
+        if (operation == 'sum') == self.__increase:
+            nets = [input] + [Net('CombinationSeries') for _ in items[1:]] + [output]
+            for item, start, end in zip(items, nets, nets[1:]):
+                blocks += self.combine(item, start, end)
         else:
-            Builder = self.template
-
-        # TODO: error from settings
-        values = values_optimal(available_values, self.value, error=15, increase=self.__increase) #if not self.SIMULATION else [self.value]
-        if not values:
-            raise_part_unavailable(block)
+            for item in items:
+                blocks += self.combine(item, input, output)
 
-        elements = []
-        # print(f'{self.value} by {values}')
-
-        total_value = 0
-        for index, value in enumerate(values):
-            if type(value) == list:
-                parallel_in = Net('CombinationArrayIn_' + str(index))
-                parallel_out = Net('CombinationArrayOut_' + str(index))
-
-                for part in value:
-                    part = u(part)
-                    unit = self.value.clone()
-                    unit._value = part
-                    unit = unit.canonise()
-
-                    r = Builder(value=unit)
-                    total_value += part / 2 if self.__increase else part
-
-                    r[1] += parallel_in
-                    r[2] += parallel_out
-
-                if index:
-                    previous_r = elements[-1]
-                    previous_r[2] += parallel_in
-
-                elements.append((None, parallel_in, parallel_out))
-
-            else:
-                value = u(value)
-                unit = self.value.clone()
-                unit._value = value
-                unit = unit.canonise()
-                r = Builder(value=unit)
-                total_value += value if self.__increase else value / 2
+        return blocks
 
-                self.element = r
 
-                if index:
-                    previous_r = elements[-1]
-                    previous_r[2] += r[1]
+def part_ranges(part):
+    return [entry.value for entry in part.params.where(Param.name == 'value')]
 
-                elements.append(r)
 
-        self.value._value = total_value
+def part_values(part):
+    """
+    Sorted absolute values of part from catalog
+    """
+    tables = [range_values(values) for values in part_ranges(part)]
 
-        self.input += elements[0][1]
-        self.output += elements[-1][2]
+    return np.unique(np.concatenate(tables)) if tables else np.empty(0)
 
-    def parallel_sum(self, values):
-        return (1 / sum(1 / np.array(values))) if self.__increase else sum(values)
 
-    def series_sum(self, values):
-        return sum(values) if self.__increase else 1 / sum(1 / np.array(values))
+# Value indexes by catalog ranges of available parts,
+# blocks of the same type with the same parts share index
+BLOCK_INDEXES_SIZE = 256
+block_indexes: 'OrderedDict[tuple, ValueIndex]' = OrderedDict()
 
 
-def part_values(part, default_value):
-    values = []
-
-    part_params = [entry.value for entry in part.params.where(Param.name == 'value')]
-    for value in part_params:
-        values_range = value.split('/')
-        if len(values_range) > 1:
-            scales, exponenta = values_range
-            for exp in exponenta.strip().split(' '):
-                exp_unit = default_value.clone().convert_to_power(0)
-                exp_unit._value = pow(10, prefixes.get(exp, None) or int(exp))
-
-                scale = np.array(scales.strip().split(' ')).astype(float)
-
-                values += list(scale * exp_unit)
-        else:
-            values += value.split(' ')
-
-    return values
-
-def block_values(block):
-    values = []
-
+def block_index(block) -> ValueIndex:
+    ranges = []
     for part in block.available_parts():
-        values += part_values(part, block.value)
+        ranges += part_ranges(part)
 
-    return values
+    key = tuple(sorted(set(ranges)))
+    if key in block_indexes:
+        block_indexes.move_to_end(key)
 
+        return block_indexes[key]
 
-def values_optimal(available_values, desire, error=10, error_threshold=0, increase=True):
-    # TODO: make better
-    closest = value_closest(available_values, desire)
+    index = block_indexes[key] = ValueIndex.merge(range_values(values) for values in key)
+    if len(block_indexes) > BLOCK_INDEXES_SIZE:
+        block_indexes.popitem(last=False)
 
-    closest_value = u(closest)
-    value = u(desire)
+    return index
 
-    max_error = value * error / 100
-    diff = value - closest_value
 
-    if not error_threshold:
-        error_threshold = max_error
+def values_closest(blocks):
+    """
+    Closest available values of blocks, blocks with the same value index
+    are resolved in one query
+    """
+    groups = {}
+    for position, block in enumerate(blocks):
+        index = block_index(block)
+        groups.setdefault(id(index), (index, []))[1].append(position)
 
-    # if available parts too far from desire
-    if diff / error_threshold > 2:
-        return None
+    closest = [None] * len(blocks)
+    for index, positions in groups.values():
+        values = index.closest([blocks[position].value for position in positions])
+        for position, value in zip(positions, values):
+            if not np.isnan(value):
+                closest[position] = value_unit(value, blocks[position].value)
 
-    values = []
-    if max_error > abs(diff) or abs(diff) < error_threshold:
-        values = [closest]
-    else:
-        if (diff > 0 and increase) or (diff < 0 and not increase):
-            values = [closest]
+    return closest
 
-            diff_closest = values_optimal(available_values, abs(diff), error_threshold=error_threshold, increase=increase)
 
-            values += diff_closest
-        else:
-            first_closest = value_closest(available_values, diff * 2)
-            first_value = u(first_closest)
-            second_value = first_value * diff / (diff - first_value)
-            second_closest = value_closest(available_values, abs(second_value))
+def value_unit(value, unit):
+    """
+    Absolute value in units of `unit`
+    """
+    unit = unit.convert_to_power(0)
+    unit._value = float(value)
 
-            values.append([first_closest, second_closest])
+    return unit.canonise()
 
-    return values
 
 def value_closest(values, value):
-    absolute_value = u(value)
-
-    closest = None
-    for unit in values:
-        if not closest:
-            closest = unit
-
-        unit_value = u(unit)
-        closest_value = u(closest)
-
-        diff_unit = abs(absolute_value - unit_value)
-        diff_closest = abs(absolute_value - closest_value)
-
-        if diff_closest > diff_unit:
-            closest = unit
-
-    return closest
+    index = values if isinstance(values, ValueIndex) else ValueIndex(values)
+    closest = index.closest(value)
 
+    return None if np.isnan(closest) else closest
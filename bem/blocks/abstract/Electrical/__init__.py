@@ -1,16 +1,9 @@
 from bem import u, Block
-from bem.utils.parser import inspect_comments, inspect_ref
-from bem.utils import uniq_f7
+from bem.utils.parser import AssignmentNote, inner_ref, inspect_ref, uniq_notes
+from bem.utils.frames import capture_frames
 from bem.abstract import Network
 from PySpice.Unit import u_V, u_Ohm, u_A, u_W, u_S, u_s
-from lcapy import R
 from skidl.net import Net as NetType
-import sys
-import re
-import inspect
-import builtins
-
-tracer_instances = [None]
 
 class Base:
     inherited = Network
@@ -27,11 +20,13 @@ class Base:
     I_load = 0 @ u_A
     R_load = 0 @ u_Ohm
 
+    # Lcapy expressions computed on demand
+    lazy_params = Block.lazy_params + ['Z_load']
+    _Z_load = None
+
     def __init__(self, *args, **kwargs):
         self.element = None
 
-        sys.setprofile(None)
-
         is_ciruit_building = kwargs.get('circuit', True)
         if kwargs.get('circuit', None) != None:
             del kwargs['circuit']
@@ -72,35 +67,25 @@ class Base:
         self.build_frame = {}
         self.build_frames = []
 
-        name = inspect_ref(self)
+        # Explicit ref is used as is when code isn't inspected
+        name = self.ref if not INSPECT and getattr(self, 'ref', '') else inspect_ref(self)
 
         # TODO: Hack for schema-explorer
-        self.ref = ref = self.name if name in ['Block', 'Instance'] else name
-
-        ref_index = 1
-        while self.ref in self.refs:
-            self.ref = ref + '_' + str(ref_index)
-            ref_index += 1
+        ref = self.name if name in ['Block', 'Instance'] else name
+        self.ref = self.refs.allocate(ref)
 
-        self.refs.append(self.ref)
-
-        def tracer(frame, event, arg, self=self):
-            if event == 'return':
-                self.build_frame = frame
-                if frame.f_code.co_name == 'circuit':
-                    self.build_frames.append(frame)
+        if not INSPECT:
+            self.circuit()
+            super().release()
 
-        # tracer is activated on next call, return or exception
-        sys.setprofile(tracer)
-        tracer_instances.append(tracer)
+            return
 
-        try:
-            # trace the function
+        # Frames of circuit methods are used for refs of inner blocks
+        with capture_frames(self) as frames:
+            self.build_frames = frames
             self.circuit()
-        finally:
-            # disable tracer and replace with old one
-            tracer_current = tracer_instances.pop()
-            sys.setprofile(tracer_instances[-1])
+
+        self.build_frame = frames[-1] if frames else {}
 
         super().release()
 
@@ -189,8 +174,19 @@ class Base:
         if not self.R_load:
             self.R_load = V_load / self.I_load
 
-        if not hasattr(self, 'Z_load'):
-            self.Z_load = R(self.R_load)
+
+    @property
+    def Z_load(self):
+        if self._Z_load is None:
+            from lcapy import R
+
+            self._Z_load = R(self.R_load)
+
+        return self._Z_load
+
+    @Z_load.setter
+    def Z_load(self, value):
+        self._Z_load = value
 
     def current(self, voltage, impedance):
         return voltage / impedance
@@ -209,10 +205,6 @@ def ref_inner_blocks(block, split=True):
     name = block.ref
     name = name.split('.')[-1]
     values = []
-    def short_tokens(origin_ref, length=4):
-        tokens = re.findall('[A-Z0-9][^A-Z0-9]*', origin_ref)
-        short_name = ''.join([token[0:length] for token in tokens])
-        return short_name
 
     for frame in block.build_frames:
         for key, value in frame.f_locals.items():
@@ -221,59 +213,16 @@ def ref_inner_blocks(block, split=True):
             is_not_refed = is_block and value not in values
 
             if key != 'self' and is_block and is_not_refed:
-                # Search in code
-                code = []
-                try:
-                    code = inspect.getsourcelines(frame.f_code)[0]
-                except OSError:
-                    if builtins.code:
-                        code = builtins.code.split('\n')
-
-                notes = []
-                if len(code):
-                    for index, line in enumerate(code):
-                        line = line.replace(' ', '').strip()
-                        if line.find(key + '=') == 0:
-                            comment_line_start = comment_line_end = index
-                            notes = inspect_comments(code, comment_line_start, comment_line_end)
-                            if hasattr(value, 'notes'):
-                                value.notes = uniq_f7(value.notes + notes)
-                            else:
-                                value.notes = notes
-                            break
-
-                key = ''.join([word.capitalize() for word
-                               in key.replace('_', '.').split('.')])
-
-                ref = key
-                if split:
-                    ref = name + '_' + key
-
-                if len(ref) > 6:
-                    name = name.replace('_', '')
-                    ref = name + '_' + key
-
-                if len(ref) > 6:
-                    name = short_tokens(name, 3)
-                    ref = name + key
-
-                if len(ref) > 6:
-                    ref = name + short_tokens(key, 3)
-
-                if len(ref) > 6:
-                    name = short_tokens(name, 2)
-                    ref = name + short_tokens(key, 3)
-
-                if len(ref) > 6:
-                    ref = short_tokens(name, 2) + short_tokens(key, 2)
-
-                if len(ref) > 6:
-                    ref = ''.join(re.findall('[A-Z0-9]+', ref))
+                # Comments of assignment are parsed when notes are exported
+                notes = [AssignmentNote(frame.f_code, key)]
+                value._notes = uniq_notes(getattr(value, '_notes', []) + notes)
+
+                ref, name = inner_ref(name, key, split)
 
                 if is_block_has_part:
                     values.append(value)
                     if value._part.ref != ref:
                         value._part.ref = ref
-                    value._part.notes = uniq_f7(value._part.notes + notes)
+                    value._part.notes = uniq_notes(value._part.notes + notes)
 
                 value.ref = ref
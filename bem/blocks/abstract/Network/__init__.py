@@ -6,7 +6,6 @@ from numpy import linspace
 from skidl import Bus, Network, Pin
 from skidl.net import Net as NetType
 from skidl.netpinlist import NetPinList
-from sympy import Integer
 
 from bem import Block, Build, Net, u_s, u_V
 from bem.utils.parser import inspect_comments, trace_call_comment
@@ -196,7 +195,12 @@ class Base(Block):
     # Pins
     def get_pins(self):
         pins = {}
-        for key, value in inspect.getmembers(self, lambda item: not (inspect.isroutine(item))):
+        lazy_params = getattr(self, 'lazy_params', [])
+        for key in dir(self):
+            if key in lazy_params:
+                continue
+
+            value = getattr(self, key, None)
             if isinstance(value, NetType) \
                     and key not in ['__doc__', 'element', 'simulation', 'ref']:
                 pins[key] = [str(pin).split(',')[0]
@@ -1,7 +1,6 @@
 import builtins
 from statistics import mean
 import string
-import sys
 import re
 from os.path import isfile
 from collections import defaultdict
@@ -88,10 +87,6 @@ class Base:
             self.template = part_template(part, self.footprint)
 
     def mount(self, *args, **kwargs):
-        # Stop profiler started in Block.__init__
-        tracer = sys.getprofile()
-        sys.setprofile(None)
-
         super().mount(*args, **kwargs)
 
         if not hasattr(self, 'selected_part') and not self.props.get('virtual_part', False):
@@ -99,9 +94,6 @@ class Base:
             if selected_part:
                 apply_part(self, selected_part)
 
-        # Restart profiler
-        sys.setprofile(tracer)
-
         if self.pins_alias and hasattr(self, 'template'):
             set_pins_aliases(self.template, self.pins_alias)
 
@@ -150,7 +142,7 @@ class Base:
         return part(*args, **kwargs)
 
     def part(self, *args, **kwargs):
-        is_mounted = True in [item[1] == self for item in self.scope]
+        is_mounted = self.scope.is_member(self)
 
         # Only one instance of Part could be used in Block
         if not hasattr(self, '_part') or self._part == None:
@@ -188,7 +180,7 @@ class Base:
 
             self._part = part
             self._part.instance = self
-            self._part.notes += self.notes
+            self._part.notes += self._notes
 
         part = self._part
         ref = self.ref or inspect_ref(self)
@@ -239,7 +231,7 @@ def raise_part_unavailable(block):
     }
     description = ', '.join([ arg + ' = ' + str(values[arg].get('value', '')) + values[arg]['unit'].get('suffix', '') for arg in values.keys()])
 
-    block.log("%s: %s" % (block.name, description))
+    block.log('%s: %s', block.name, description)
 #    raise LookupError("No suitable part in stock")
 
 
@@ -3,7 +3,6 @@ from bem.abstract import Combination
 from skidl import Part, TEMPLATE
 from PySpice.Unit import u_F, u_V, u_C, u_J, u_F
 import numpy as np
-from lcapy import C
 
 
 class Base(Combination()):
@@ -58,6 +57,8 @@ class Base(Combination()):
 
     # Lcapy
     def network(self):
+        from lcapy import C
+
         return C(self.value)
 
     def energy(self, voltage):
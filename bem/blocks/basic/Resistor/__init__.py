@@ -1,5 +1,4 @@
 from PySpice.Unit import u_Ohm, u_V
-from lcapy import R
 from bem import Build
 from bem.abstract import Combination
 
@@ -62,5 +61,7 @@ class Base:
 
     # Lcapy experimental
     def network(self):
+        from lcapy import R
+
         return R(self.value)
 
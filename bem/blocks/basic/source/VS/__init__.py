@@ -2,7 +2,6 @@ from bem import Build, u_V
 
 from bem.abstract import Physical
 from skidl import Net, Part, TEMPLATE
-from lcapy import log10
 from copy import copy
 
 
@@ -53,6 +52,8 @@ class Base(Physical()):
         Returns:
             [float] -- Compared the relative amplitudes in dB of two Signals
         """
+        from lcapy import log10
+
         return 20 * log10(other.amplitude / self.amplitude)
 
 
@@ -1,6 +1,4 @@
 from bem import u, u_V, u_s, u_Hz
-from lcapy import Vdc
-from sympy import Float
 
 
 class Modificator:
@@ -1,6 +1,4 @@
 from bem import u, u_V, u_Hz, u_V, u_s
-from lcapy import Vac, pi, f, t, sin, sqrt
-from sympy import Integer, Float
 from numpy import linspace
 
 
@@ -25,36 +23,55 @@ class Modificator:
             return super().part(value='~ ' + str(self.V.canonise()) + ' / ' + str(self.frequency.canonise()))
 
     def network(self):
+        from lcapy import Vac
+
         return Vac(self.amplitude)
 
     def transfer(self, time=0 @ u_s):
+        from lcapy import f, pi, sin, t
+
         if time == 0:
             return self.amplitude * sin(2 * pi * self.frequency * t + self.phase())
         else:
             return self.amplitude * sin(2 * pi * f * time + self.phase())
 
     def phase(self):
+        from lcapy import pi
+        from sympy import Integer
+
         return Integer(0) if not self.delay else (2 * pi) / self.delay
 
     def phase_radian(self):
+        from lcapy import pi
+
         return self.phase() / pi
 
     def period(self):
+        from sympy import Integer
+
         return Integer(1) / self.frequency
 
     def angular_velocity(self):
+        from lcapy import pi
+
         return 2 * pi * self.frequency
 
     def value(self, time=0 @ u_s):
         return self.transfer(time)
 
     def value_peak(self):
+        from sympy import Float
+
         return Float(self.amplitude)
 
     def value_rms(self):
+        from lcapy import sqrt
+
         return self.value_peak() / sqrt(2)
 
     def value_avg(self):
+        from lcapy import pi
+
         return 2 * self.value_peak() / pi
 
 
@@ -1,6 +1,4 @@
 from bem import u, u_V, u_s
-from lcapy import Vdc
-from sympy import Float
 
 
 class Modificator:
@@ -12,6 +10,8 @@ class Modificator:
         }
 
     def network(self):
+        from lcapy import Vdc
+
         return Vdc(self.V)
 
     def part(self):
@@ -1,29 +1,118 @@
-import json
+import sys
 from collections import OrderedDict
 from functools import lru_cache
+from importlib import reload
 from inspect import currentframe, getmro
 from os import path
-from typing import Any, List, Optional, Union, cast, Dict
+from typing import Any, List, Optional, Tuple, Union, cast, Dict
 
-from skidl import SKIDL, SPICE, TEMPLATE, Part, SchLib, set_default_tool
+from skidl import (SKIDL, SPICE, TEMPLATE, Part, SchLib, get_default_tool,
+                   set_default_tool)
 
 from .base import Block as BaseBlock
 from .utils import uniq_f7
-from .utils.args import default_arguments, safe_serialize
-from .utils.structer import (get_block_class, get_mod_classes, mods_from_dict,
-                             mods_predefined)
+from .utils.args import default_arguments, mount_plan, params_schema
+from .utils.parser import class_descriptions
+from .utils.structer import (freeze_mods, get_block_class, get_mod_classes,
+                             invalidate_resolution, mods_from_dict,
+                             mods_predefined, sorted_mods)
 
 ModsType = Dict[str, List[str]]
 
 
-spice_lib = SchLib('pyspice', tool=SKIDL)
-spice_parts = spice_lib.get_parts()
+@lru_cache(maxsize=None)
+def spice_index():
+    """
+    Parts of PySpice library by name and aliases,
+    library is loaded on first SPICE part request,
+    default tool of skidl is restored after
+    """
+    tool = get_default_tool()
+    set_default_tool(SPICE)
+
+    try:
+        spice_lib = SchLib('pyspice', tool=SKIDL)
+        index = {}
+        for part in spice_lib.get_parts():
+            index.setdefault(part.name, part)
+            for alias in getattr(part, 'aliases', None) or []:
+                index.setdefault(alias, part)
+    finally:
+        set_default_tool(tool)
+
+    return index
+
 
 @lru_cache(maxsize=100)
 def PartCached(library, symbol, dest):
     return Part(library, symbol, dest=dest)
 
 
+# Composed Block classes by signature of name, mods and props
+# signature -> (Block, { source file: mtime }), least recently used are dropped
+BLOCKS_CACHE_SIZE = 512
+blocks_cache: 'OrderedDict[Tuple, Any]' = OrderedDict()
+
+
+def block_signature(name: str, mods: ModsType, props: ModsType) -> Optional[Tuple]:
+    """
+    Canonical signature of composed Block,
+    None if props contain values that couldn't be compared by value
+    """
+    def is_plain(value):
+        if isinstance(value, (list, tuple)):
+            return all(is_plain(item) for item in value)
+
+        return value is None or isinstance(value, (str, int, float, bool))
+
+    if not all(is_plain(value) for value in list(mods.values()) + list(props.values())):
+        return None
+
+    # Modificators are composed in order of request, props are set at once
+    return (name, freeze_mods(mods), sorted_mods(props))
+
+
+def block_sources(Block) -> Dict[str, float]:
+    sources = {}
+    for cls in Block.classes:
+        module = sys.modules.get(cls.__module__, None)
+        file = getattr(module, '__file__', None)
+        if file and path.isfile(file):
+            sources[file] = path.getmtime(file)
+
+    return sources
+
+
+def invalidate_blocks():
+    """
+    Drop all composed Block classes
+    """
+    blocks_cache.clear()
+
+
+def refresh_blocks():
+    """
+    Reload block modules with changed sources
+    and drop composed Block classes built from them
+    """
+    changed = set()
+    for signature, (Block, sources) in list(blocks_cache.items()):
+        for file, mtime in sources.items():
+            if not path.isfile(file) or path.getmtime(file) != mtime:
+                changed.add(file)
+                del blocks_cache[signature]
+                break
+
+    if not changed:
+        return
+
+    for module in list(sys.modules.values()):
+        if getattr(module, '__file__', None) in changed:
+            reload(module)
+
+    invalidate_resolution()
+
+
 class Build:
     def __init__(self, name: str, *args, **kwargs: ModsType):
         self.name: str = name
@@ -55,12 +144,11 @@ class Build:
             **mods_predefined(self.base),
             **mods_from_dict(kwargs)
         }
-        request_mods_json = safe_serialize(request_mods)
         self.mods = {}
 
         #classes = list(getmro(self.base))[:-1]
         if hasattr(self.base, 'inherited'):
-            mod_files, mod_classes, mods_loaded = get_mod_classes(self.name, request_mods_json)
+            mod_files, mod_classes, mods_loaded = get_mod_classes(self.name, freeze_mods(request_mods))
             for cls in mod_classes:
                 request_mods = {
                     **request_mods,
@@ -94,8 +182,7 @@ class Build:
                 **mods_predefined(base_cls),
                 **request_mods,
             }
-            request_mods_json = safe_serialize(request_mods)
-            mod_files, mod_classes, mods_loaded = get_mod_classes(base.name, request_mods_json)
+            mod_files, mod_classes, mods_loaded = get_mod_classes(base.name, freeze_mods(request_mods))
             for cls in mod_classes:
                 request_mods = {
                     **mods_predefined(cls),
@@ -167,6 +254,12 @@ class Build:
 
     @property
     def block(self):
+        signature = block_signature(self.name, self.mods, self.props)
+        if signature in blocks_cache:
+            blocks_cache.move_to_end(signature)
+
+            return blocks_cache[signature][0]
+
         self.inherited = []
 
         self.files.reverse()
@@ -185,6 +278,14 @@ class Build:
         Block.classes = list(getmro(Block))
         Block.models = self.blocks()
         Block.arguments, Block.defaults = default_arguments(Block)
+        Block.mount_plan = mount_plan(Block)
+        Block.class_description, Block.params_description = class_descriptions(Block)
+        Block.params_schema = params_schema(Block)
+
+        if signature:
+            blocks_cache[signature] = (Block, block_sources(Block))
+            if len(blocks_cache) > BLOCKS_CACHE_SIZE:
+                blocks_cache.popitem(last=False)
 
         return Block
 
@@ -194,11 +295,9 @@ class Build:
 
     @property
     def spice(self):
-        set_default_tool(SPICE)
-
-        for p in spice_parts:
-            if self.name == p.name or (hasattr(p, 'aliases') and self.name in p.aliases):
-                return p
+        part = spice_index().get(self.name, None)
+        if part is not None:
+            return part
 
         if self.name.find(':') != -1:
             kicad, spice = self.name.split(':')
@@ -1,6 +1,78 @@
-from peewee import SqliteDatabase, IntegerField, CharField, TextField, ManyToManyField, Model
+from os import getenv
+from urllib.parse import quote
 
-db = SqliteDatabase('data.db')
+from peewee import DatabaseProxy, SqliteDatabase, IntegerField, CharField, TextField, ManyToManyField, Model
+
+DATABASE = 'data.db'
+
+# Applied on every connection
+PRAGMAS = {
+    'cache_size': -64 * 1000,  # 64 MB
+    'mmap_size': 256 * 1024 * 1024,
+    'temp_store': 'memory'
+}
+
+MODES = ['rw', 'ro', 'immutable']
+
+
+class Catalog(DatabaseProxy):
+    """
+    Catalog database initialised on first query with `connect()` defaults
+    or explicitly with `connect(database, mode, pragmas)`.
+    """
+    def __getattr__(self, attr):
+        if self.obj is None:
+            connect()
+
+        return super().__getattr__(attr)
+
+    def __enter__(self):
+        if self.obj is None:
+            connect()
+
+        return super().__enter__()
+
+
+db = Catalog()
+
+
+def connect(database=None, mode=None, pragmas=None):
+    """
+    database -- Path or `file:` URI, `BEM_DATABASE` or 'data.db' by default
+    mode -- 'rw', 'ro' for read-only or 'immutable' for read-only media, `BEM_DATABASE_MODE` or 'rw' by default
+    pragmas -- SQLite pragmas, `PRAGMAS` by default. WAL journal used in 'rw' mode
+    """
+    database = database or getenv('BEM_DATABASE') or DATABASE
+    mode = mode or getenv('BEM_DATABASE_MODE') or 'rw'
+    if mode not in MODES:
+        raise ValueError("Catalog mode should be one of %s, not '%s'" % (', '.join(MODES), mode))
+
+    is_uri = database.startswith('file:')
+    options = {**PRAGMAS, **(pragmas or {})}
+
+    if mode == 'rw':
+        if database != ':memory:':
+            options = {'journal_mode': 'wal', **options}
+    else:
+        if not is_uri:
+            database = 'file:' + quote(database)
+            is_uri = True
+
+        database += ('&' if '?' in database else '?') + ('immutable=1' if mode == 'immutable' else 'mode=ro')
+
+    disconnect()
+    db.initialize(SqliteDatabase(database, uri=is_uri, pragmas=options))
+
+    return db
+
+
+def disconnect():
+    """
+    Close catalog connection, next query connects with defaults again
+    """
+    if db.obj is not None:
+        db.obj.close()
+        db.initialize(None)
 
 class BaseModel(Model):
     class Meta:
@@ -72,6 +144,10 @@ class Part(BaseModel):
 
         return params
 
-db.connect()
-db.create_tables([Stock, Param, Mod, Prop, Part, Pin, Part.params.get_through_model(), Part.stock.get_through_model(), Part.mods.get_through_model(), Part.props.get_through_model(), Part.pins.get_through_model()])
+
+def migrate():
+    """
+    Create catalog tables, safe to run on existing catalog
+    """
+    db.create_tables([Stock, Param, Mod, Prop, Part, Pin, Part.params.get_through_model(), Part.stock.get_through_model(), Part.mods.get_through_model(), Part.props.get_through_model(), Part.pins.get_through_model()])
 
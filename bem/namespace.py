@@ -0,0 +1,117 @@
+"""
+Lazy block namespace.
+
+Modules like `bem.analog.voltage` are created by import hook on first use,
+blocks inside them are resolved on attribute access. So importing `bem`
+doesn't walk block libraries and cost of access doesn't depend on library size.
+"""
+import sys
+from importlib.abc import Loader, MetaPathFinder
+from importlib.machinery import ModuleSpec
+from os import listdir
+from os.path import isdir, isfile, join
+from types import ModuleType
+from typing import List
+
+from .builder import Build
+
+
+def block_builder(name: str):
+    def build(*args, **kwargs):
+        return Build(name, *args, **kwargs).block
+
+    build.__name__ = build.__qualname__ = name.split('.')[-1]
+
+    return build
+
+
+def is_scope_name(name: str) -> bool:
+    return name[:1].islower()
+
+
+def is_block_name(name: str) -> bool:
+    return name[:1].isupper()
+
+
+class BlockScope(ModuleType):
+    """
+    Scope of blocks, for example `bem.basic`.
+    Block builders resolved and cached on first access.
+    """
+    def __init__(self, name: str, roots: List[str]):
+        super().__init__(name)
+
+        self.__path__ = []
+        self.__scope__ = name.split('.')[1:]
+        self.__roots__ = roots
+
+    def __getattr__(self, block):
+        if not is_block_name(block):
+            raise AttributeError("module '%s' has no attribute '%s'" % (self.__name__, block))
+
+        for root in self.__roots__:
+            if isfile(join(root, *self.__scope__, block, '__init__.py')):
+                break
+        else:
+            raise AttributeError("module '%s' has no block '%s'" % (self.__name__, block))
+
+        builder = block_builder('.'.join(self.__scope__ + [block]))
+        setattr(self, block, builder)
+
+        return builder
+
+    def __dir__(self):
+        blocks = set()
+        for root in self.__roots__:
+            scope_root = join(root, *self.__scope__)
+            if not isdir(scope_root):
+                continue
+
+            blocks.update(name for name in listdir(scope_root)
+                          if is_block_name(name) and isfile(join(scope_root, name, '__init__.py')))
+
+        return sorted(set(super().__dir__()) | blocks)
+
+
+class BlockScopeFinder(MetaPathFinder, Loader):
+    """
+    Import hook that creates `BlockScope` for `<package>.<scope>...`
+    if scope directory exists in one of libraries roots.
+    """
+    def __init__(self, package: str, roots: List[str]):
+        self.package = package
+        self.roots = roots
+
+    def find_spec(self, fullname, path=None, target=None):
+        prefix = self.package + '.'
+        if not fullname.startswith(prefix):
+            return None
+
+        scope = fullname[len(prefix):].split('.')
+        if not all(is_scope_name(name) for name in scope):
+            return None
+
+        for root in self.roots:
+            if isdir(join(root, *scope)):
+                return ModuleSpec(fullname, self, is_package=True)
+
+        return None
+
+    def create_module(self, spec):
+        return BlockScope(spec.name, self.roots)
+
+    def exec_module(self, module):
+        pass
+
+
+def install_finder(package: str, roots: List[str]) -> BlockScopeFinder:
+    for finder in sys.meta_path:
+        if isinstance(finder, BlockScopeFinder) and finder.package == package:
+            finder.roots = roots
+
+            return finder
+
+    finder = BlockScopeFinder(package, roots)
+    sys.meta_path.append(finder)
+
+    return finder
@@ -0,0 +1,293 @@
+"""
+Registry of blocks, modificators and tests available in library root.
+
+Directory listings are reused while directory mtime is unchanged, so only
+changed subtrees are scanned again. Listings are saved to manifest file on
+explicit refresh, or on every scan when `BEM_REGISTRY` directory is set.
+Lookup misses check directories on the path and rescan if they changed.
+"""
+import json
+import os
+from hashlib import sha1
+from os.path import abspath, expanduser, join
+from typing import Dict, List, Optional, Tuple
+
+MANIFEST_VERSION = 1
+
+
+def manifest_dir() -> str:
+    return os.getenv('BEM_REGISTRY') or join(expanduser('~'), '.cache', 'bem')
+
+
+def manifest_path(root: str) -> str:
+    digest = sha1(root.encode('utf-8')).hexdigest()[:16]
+
+    return join(manifest_dir(), 'registry-%s.json' % digest)
+
+
+def is_scope_dir(name: str) -> bool:
+    return name[:1].islower()
+
+
+def is_block_dir(name: str) -> bool:
+    return name[:1].isupper()
+
+
+def is_mod_dir(name: str) -> bool:
+    return name[:1] == '_' and not name.startswith('__')
+
+
+class Registry:
+    """
+    Index of library root:
+    * scopes -- 'analog.voltage' -> has test.py
+    * blocks -- 'analog.voltage.Divider' -> modificators and tests
+    """
+    def __init__(self, root: str, manifest: Optional[str] = None):
+        self.root = abspath(root)
+        self.manifest = manifest or manifest_path(self.root)
+        # Manifest is written on every scan only if it's requested
+        self.persistent = bool(manifest or os.getenv('BEM_REGISTRY'))
+        self.dirs: Dict[str, dict] = {}
+        self.scopes: Dict[str, dict] = {}
+        self.blocks: Dict[str, dict] = {}
+
+        self.refresh(save=self.persistent)
+
+    def load(self) -> Dict[str, dict]:
+        try:
+            with open(self.manifest) as manifest:
+                data = json.load(manifest)
+        except (OSError, ValueError):
+            return {}
+
+        if data.get('version') != MANIFEST_VERSION or data.get('root') != self.root:
+            return {}
+
+        return data.get('dirs', {})
+
+    def save(self):
+        data = {
+            'version': MANIFEST_VERSION,
+            'root': self.root,
+            'dirs': self.dirs
+        }
+
+        # Manifest is optional, library could be on read-only filesystem
+        try:
+            os.makedirs(os.path.dirname(self.manifest), exist_ok=True)
+            tmp = self.manifest + '.%d.tmp' % os.getpid()
+            with open(tmp, 'w') as manifest:
+                json.dump(data, manifest)
+            os.replace(tmp, self.manifest)
+        except OSError:
+            pass
+
+    def listing(self, path: str, cached: Optional[dict]) -> Tuple[dict, bool]:
+        mtime = os.stat(join(self.root, path)).st_mtime_ns
+        if cached and cached.get('mtime') == mtime:
+            return cached, False
+
+        dirs = []
+        files = []
+        with os.scandir(join(self.root, path)) as entries:
+            for entry in entries:
+                if entry.is_dir():
+                    dirs.append(entry.name)
+                elif entry.is_file():
+                    files.append(entry.name)
+
+        return {
+            'mtime': mtime,
+            'dirs': sorted(dirs),
+            'files': sorted(files)
+        }, True
+
+    def refresh(self, save: bool = True):
+        """
+        Walk library root, rescan only directories with changed mtime
+        and save manifest if something changed.
+        """
+        cached = self.dirs or self.load()
+        dirs = {}
+        changed = False
+
+        # (relative path, kind of directory)
+        stack = [('', 'root')]
+        while stack:
+            path, kind = stack.pop()
+            try:
+                entry, is_changed = self.listing(path, cached.get(path))
+            except OSError:
+                continue
+
+            dirs[path] = entry
+            changed = changed or is_changed
+
+            for name in entry['dirs']:
+                if kind in ['root', 'scope'] and (is_scope_dir(name) or is_block_dir(name)):
+                    stack.append((join(path, name) if path else name,
+                                  'scope' if is_scope_dir(name) else 'block'))
+                elif kind == 'block' and is_mod_dir(name):
+                    stack.append((join(path, name), 'mod'))
+
+        self.dirs = dirs
+        if save and (changed or set(dirs) != set(cached)):
+            self.save()
+
+        self.index()
+
+    def is_stale(self, parts: List[str]) -> bool:
+        """
+        Is any of indexed directories on the path changed
+        """
+        for depth in range(len(parts) + 1):
+            path = join(*parts[:depth]) if depth else ''
+            entry = self.dirs.get(path, None)
+            if entry is None:
+                break
+
+            try:
+                mtime = os.stat(join(self.root, path)).st_mtime_ns
+            except OSError:
+                return True
+
+            if entry['mtime'] != mtime:
+                return True
+
+        return False
+
+    def recheck(self, parts: List[str]) -> bool:
+        """
+        Rescan library on lookup miss if directories on the path changed
+        """
+        if not self.is_stale(parts):
+            return False
+
+        self.refresh(save=self.persistent)
+
+        return True
+
+    def index(self):
+        scopes = {}
+        blocks = {}
+
+        for path, entry in self.dirs.items():
+            if not path:
+                continue
+
+            parts = path.split(os.sep)
+            name = parts[-1]
+
+            if all(is_scope_dir(part) for part in parts):
+                scopes['.'.join(parts)] = {
+                    'test': 'test.py' in entry['files']
+                }
+            elif is_block_dir(name) and all(is_scope_dir(part) for part in parts[:-1]):
+                if '__init__.py' not in entry['files']:
+                    continue
+
+                mods = {}
+                tests = {}
+                for mod_dir in entry['dirs']:
+                    mod_entry = self.dirs.get(join(path, mod_dir), None)
+                    if not is_mod_dir(mod_dir) or not mod_entry:
+                        continue
+
+                    values = [file[:-3] for file in mod_entry['files'] if file.endswith('.py')]
+                    mods[mod_dir[1:]] = [value for value in values if not value.endswith('_test')]
+                    tests[mod_dir[1:]] = [value[:-5] for value in values if value.endswith('_test')]
+
+                blocks['.'.join(parts)] = {
+                    'mods': mods,
+                    'test': 'test.py' in entry['files'],
+                    'mods_test': tests
+                }
+
+        self.scopes = scopes
+        self.blocks = blocks
+
+    def is_scope(self, name: str) -> bool:
+        return name in self.scopes
+
+    def block(self, name: str) -> Optional[dict]:
+        if name not in self.blocks:
+            self.recheck(name.split('.'))
+
+        return self.blocks.get(name, None)
+
+    def block_file(self, name: str) -> Optional[str]:
+        if not self.block(name):
+            return None
+
+        return join(self.root, *name.split('.'), '__init__.py')
+
+    def mod_file(self, name: str, mod: str, value: str) -> Optional[str]:
+        value = str(value)
+        block = self.block(name)
+        if block and value not in block['mods'].get(mod, []) \
+                and self.recheck(name.split('.') + ['_' + mod]):
+            block = self.blocks.get(name, None)
+
+        if not block or value not in block['mods'].get(mod, []):
+            return None
+
+        return join(self.root, *name.split('.'), '_' + mod, value + '.py')
+
+    def has_test(self, name: str) -> bool:
+        entry = self.block(name) or self.scopes.get(name, None)
+
+        return bool(entry and entry['test'])
+
+    def has_mod_test(self, name: str, mod: str, value: str) -> bool:
+        block = self.block(name)
+
+        return bool(block and str(value) in block['mods_test'].get(mod, []))
+
+    def scope(self) -> dict:
+        """
+        Nested dict of scopes with blocks and their modificators
+        `{ 'basic': { 'Resistor': {}, 'source': { 'VS': { 'flow': ['V', ...] } } } }`
+        """
+        scope = {}
+
+        for name in sorted(self.scopes):
+            node = scope
+            for part in name.split('.'):
+                node = node.setdefault(part, {})
+
+        for name, block in self.blocks.items():
+            parts = name.split('.')
+            if len(parts) < 2:
+                continue
+
+            node = scope
+            for part in parts[:-1]:
+                node = node.setdefault(part, {})
+
+            node[parts[-1]] = {mod: list(values) for mod, values in block['mods'].items()}
+
+        return scope
+
+
+registries: Dict[str, Registry] = {}
+
+
+def registry(root: str) -> Registry:
+    root = abspath(root)
+    if root not in registries:
+        registries[root] = Registry(root)
+
+    return registries[root]
+
+
+def invalidate(root: Optional[str] = None):
+    """
+    Rescan changed directories of library root or all loaded registries
+    and save their manifests
+    """
+    roots: List[str] = [abspath(root)] if root else list(registries.keys())
+
+    for path in roots:
+        if path in registries:
+            registries[path].refresh()
@@ -16,6 +16,7 @@ from subprocess import PIPE, run
 from skidl import Part, Net
 
 from bem import Block, get_created_blocks
+from bem.utils.parser import resolve_notes
 from bem.utils.structer import hierarchy
 
 
@@ -118,7 +119,7 @@ class Schematic:
             'ref': part.ref,
             'type': part.ref, #symbol,
             'name': part.name,
-            'description': [entry.strip() for entry in part.description.split(',')] + part.notes,
+            'description': [entry.strip() for entry in part.description.split(',')] + resolve_notes(part.notes),
             'attributes': {
                 'value': str(value)
             },
@@ -137,13 +138,14 @@ class Schematic:
             net_name = str(nets[0].name) if len(nets) > 0 else ''
             instance['connections'][pin.num] = net_name
 
-            pin_description = pin.notes[-1] if len(pin.notes) else ''
+            pin_notes = resolve_notes(pin.notes)
+            pin_description = pin_notes[-1] if len(pin_notes) else ''
             port_direction = pin_description.split(':')[0] or 'input'
 
-            log.info('%s.%s as [%s]: %s', part.ref, pin.num, port_direction, '; '.join(pin.notes))
+            log.info('%s.%s as [%s]: %s', part.ref, pin.num, port_direction, '; '.join(pin_notes))
 
             instance['port_directions'][pin.num] = port_direction
-            instance['port_description'][pin.num] = [pin.name] + list(reversed(pin.notes))
+            instance['port_description'][pin.num] = [pin.name] + list(reversed(pin_notes))
 
         instance['pins_count'] = len(part.pins)
 
@@ -0,0 +1,169 @@
+"""
+Scope of blocks and refs created in build.
+
+Scope is a list of `(owner, block)` pairs in order of creation with indexes
+maintained on append, so membership, children of owner and blocks of
+certain type are found without scanning the whole design.
+Refs keep set and counters to allocate unique ref without scanning.
+Other changes of the lists, like `insert`, `remove` or slice assignment,
+rebuild indexes from items.
+"""
+from collections import defaultdict
+from typing import Any, Dict, Iterable, List, Tuple
+
+
+class IndexedList(list):
+    """
+    List with indexes updated on `append`, other changes rebuild them
+    """
+    def reindex(self):
+        items = list(self)
+        self.clear()
+        self.extend(items)
+
+    def extend(self, items: Iterable):
+        for item in items:
+            self.append(item)
+
+    def __iadd__(self, items: Iterable):
+        self.extend(items)
+
+        return self
+
+    def __imul__(self, times: int):
+        super().__imul__(times)
+        self.reindex()
+
+        return self
+
+    def __setitem__(self, index, item):
+        super().__setitem__(index, item)
+        self.reindex()
+
+    def __delitem__(self, index):
+        super().__delitem__(index)
+        self.reindex()
+
+    def insert(self, index: int, item):
+        super().insert(index, item)
+        self.reindex()
+
+    def remove(self, item):
+        super().remove(item)
+        self.reindex()
+
+    def pop(self, index: int = -1):
+        item = super().pop(index)
+        self.reindex()
+
+        return item
+
+    def sort(self, *args, **kwargs):
+        super().sort(*args, **kwargs)
+        self.reindex()
+
+    def reverse(self):
+        super().reverse()
+        self.reindex()
+
+
+class Scope(IndexedList):
+    """
+    List of `(owner, block)` with indexes:
+    * members -- ids of blocks in scope
+    * owners -- owner by id, in order of first appearance
+    * children -- blocks by id of owner
+    * types -- positions of blocks by class
+    """
+    def __init__(self, items: Iterable[Tuple[Any, Any]] = ()):
+        super().__init__()
+
+        self.members = set()
+        self.owners: Dict[int, Any] = {}
+        self.children: Dict[int, List[Any]] = defaultdict(list)
+        self.types: Dict[type, List[int]] = defaultdict(list)
+
+        for item in items:
+            self.append(item)
+
+    def append(self, item: Tuple[Any, Any]):
+        owner, block = item
+
+        self.members.add(id(block))
+        self.owners.setdefault(id(owner), owner)
+        self.children[id(owner)].append(block)
+        self.types[block.__class__].append(len(self))
+
+        super().append(item)
+
+    def clear(self):
+        super().clear()
+
+        self.members.clear()
+        self.owners.clear()
+        self.children.clear()
+        self.types.clear()
+
+    def is_member(self, block) -> bool:
+        return id(block) in self.members
+
+    def children_of(self, owner) -> List[Any]:
+        return self.children.get(id(owner), [])
+
+    def blocks_of_type(self, block_type: type) -> List[Any]:
+        """
+        Blocks that are instances of `block_type` in order of creation
+        """
+        positions = []
+        for cls, indexes in self.types.items():
+            if issubclass(cls, block_type):
+                positions.extend(indexes)
+
+        positions.sort()
+
+        return [self[index][1] for index in positions]
+
+
+class Refs(IndexedList):
+    """
+    List of refs used in build with set for membership
+    and next free index by ref prefix, `R`, `R_1`, `R_2`...
+    """
+    def __init__(self, refs: Iterable[str] = ()):
+        super().__init__()
+
+        self.taken = set()
+        self.counters: Dict[str, int] = {}
+
+        self.extend(refs)
+
+    def __contains__(self, ref) -> bool:
+        return ref in self.taken
+
+    def append(self, ref: str):
+        self.taken.add(ref)
+
+        super().append(ref)
+
+    def clear(self):
+        super().clear()
+
+        self.taken.clear()
+        self.counters.clear()
+
+    def allocate(self, ref: str) -> str:
+        """
+        Reserve `ref` or `ref_<index>` with the lowest free index
+        """
+        unique = ref
+        index = self.counters.get(ref, 1)
+        while unique in self.taken:
+            unique = ref + '_' + str(index)
+            index += 1
+
+        if unique != ref:
+            self.counters[ref] = index
+
+        self.append(unique)
+
+        return unique
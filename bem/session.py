@@ -0,0 +1,187 @@
+"""
+Build sessions.
+
+Session owns state of design building: scope of created blocks, owners
+stack, refs, circuit and mode flags. Current session is stored in context
+variable, so independent designs could be built in parallel threads or
+asyncio tasks:
+
+    with Session(simulation=True) as session:
+        Divider(V=10, V_out=3)
+
+    session.scope, session.circuit
+    session.dispose()
+
+Outside of any session the process wide default session is used.
+Long running processes should dispose sessions of finished builds.
+`Block.scope`, `Block.owner` and `Block.refs` are resolved from current session,
+`SIMULATION`, `DEBUG`, `INSPECT` and `default_circuit` builtins are proxies to it.
+"""
+import builtins
+from contextvars import ContextVar
+from typing import Any, List, Optional
+
+from .scope import Refs, Scope
+
+# Builtin name -> session flag
+FLAGS = {
+    'SIMULATION': 'simulation',
+    'DEBUG': 'debug',
+    'INSPECT': 'inspect'
+}
+
+
+# Process wide session, created at import below
+default_session: Optional['Session'] = None
+
+
+class Session:
+    """
+    Flags that aren't passed are taken from current session,
+    new circuit is created if it isn't passed.
+    """
+    def __init__(self, circuit=None, **flags):
+        # Flags could be assigned to builtins directly, take them first
+        if default_session is not None:
+            install()
+
+        self.scope = Scope()
+        self.owner: List[Any] = [None]
+        self.refs = Refs()
+
+        # Blocks in release with their captured circuit frames
+        self.captures: List[tuple] = []
+
+        if circuit is None:
+            from skidl import Circuit
+
+            circuit = Circuit()
+
+        self.circuit = circuit
+
+        for flag in FLAGS.values():
+            value = flags[flag] if flag in flags else getattr(current_session(), flag)
+            setattr(self, flag, bool(value))
+
+        self.tokens = []
+
+    def __enter__(self):
+        install()
+        self.tokens.append(session.set(self))
+
+        return self
+
+    def __exit__(self, type, value, traceback):
+        session.reset(self.tokens.pop())
+
+    def dispose(self):
+        """
+        Release blocks, parts and nets of build,
+        session starts from empty scope and new circuit after
+        """
+        from skidl import Circuit
+
+        # Captured frames keep locals of circuit methods and blocks in them
+        for owner, block in self.scope:
+            state = getattr(block, '__dict__', {})
+            state.pop('build_frames', None)
+            state.pop('build_frame', None)
+
+        self.scope.clear()
+        self.refs.clear()
+        self.owner[:] = [None]
+        self.captures.clear()
+
+        self.circuit = Circuit()
+
+
+class Flag:
+    """
+    Mode flag of current session, evaluated by `if SIMULATION:`
+    """
+    def __init__(self, flag: str):
+        self.flag = flag
+
+    def __bool__(self):
+        return getattr(current_session(), self.flag)
+
+    def __repr__(self):
+        return repr(bool(self))
+
+
+class CircuitProxy:
+    """
+    `builtins.default_circuit` used by skidl for parts and nets,
+    resolved to circuit of current session
+    """
+    def __getattr__(self, name):
+        return getattr(current_session().circuit, name)
+
+    def __setattr__(self, name, value):
+        setattr(current_session().circuit, name, value)
+
+    def __iadd__(self, stuff):
+        current_session().circuit.__iadd__(stuff)
+
+        return self
+
+    def __isub__(self, stuff):
+        current_session().circuit.__isub__(stuff)
+
+        return self
+
+    @property
+    def __class__(self):
+        return current_session().circuit.__class__
+
+
+def install():
+    """
+    Put proxies to builtins, plain values assigned there
+    are taken as values of default session.
+    Called on session creation, enter and SPICE environment setup,
+    so direct assignment like `builtins.SIMULATION = False` doesn't
+    leave plain value in builtins.
+    """
+    for name, flag in FLAGS.items():
+        value = getattr(builtins, name, None)
+        if not isinstance(value, Flag):
+            if value is not None:
+                setattr(default_session, flag, bool(value))
+
+            setattr(builtins, name, Flag(flag))
+
+    circuit = getattr(builtins, 'default_circuit', None)
+    if type(circuit) is not CircuitProxy:
+        if circuit is not None:
+            default_session.circuit = circuit
+
+        builtins.default_circuit = CircuitProxy()
+
+
+default_session = Session(circuit=getattr(builtins, 'default_circuit', None),
+                          **{flag: getattr(builtins, name, False) for name, flag in FLAGS.items()})
+session: ContextVar[Session] = ContextVar('session', default=default_session)
+
+
+def current_session() -> Session:
+    return session.get()
+
+
+class SessionAttribute:
+    """
+    Class attribute resolved from current session, `Block.scope`.
+    Assignment to instance attribute sets it in current session,
+    assignment to class attribute replaces the descriptor and isn't supported.
+    """
+    def __init__(self, name: Optional[str] = None):
+        self.name = name
+
+    def __set_name__(self, owner, name):
+        self.name = self.name or name
+
+    def __get__(self, instance, owner=None):
+        return getattr(current_session(), self.name)
+
+    def __set__(self, instance, value):
+        setattr(current_session(), self.name, value)
@@ -12,8 +12,10 @@ from skidl import (KICAD, SPICE, Circuit, Net, search, set_backup_lib,
 from skidl.pyspice import *
 
 from .base import Block
+from .scope import Refs, Scope
+from .session import current_session, install
 from .utils.logger import ERC_logger
-from .utils.args import u
+from .utils.args import u, u_array
 
 from pdb import set_trace as bp
 
@@ -35,7 +37,7 @@ class Simulate:
         self.block = block
 
         from skidl.tools.spice import node
-        circuit = builtins.default_circuit
+        circuit = current_session().circuit
 
         # Connect unused units to NC network
         # Needed for correct SPICE simulation
@@ -95,18 +97,22 @@ class Simulate:
         #     voltage[key] = fft(voltage[key])
 
 
+        # Waveforms converted to floats at once
+        voltage = {key: u_array(value).tolist() for key, value in voltage.items()}
+        current = {key: u_array(value).tolist() for key, value in current.items()
+                   if key.find('.') == -1}
+
         data = []
-        for index, entity in enumerate(index):
+        for index, entity in enumerate(u_array(index).tolist()):
             entry = {
-                index_field: entity.value * entity.scale
+                index_field: entity
             }
 
             for key in voltage.keys():
-                entry['V_' + key] = u(voltage[key][index])
+                entry['V_' + key] = voltage[key][index]
 
             for key in current.keys():
-                if key.find('.') == -1:
-                    entry['I_' + key] = u(current[key][index])
+                entry['I_' + key] = current[key][index]
 
             data.append(entry)
 
@@ -194,19 +200,21 @@ class Simulate:
         return [chart[index] for index in sweep]
 
 def set_spice_enviroment():
-    Block.scope = []
-    Block.refs = []
+    # Environment is set for current build session only,
+    # flags assigned to builtins directly are taken before
+    install()
+    session = current_session()
+    session.scope = Scope()
+    session.refs = Refs()
     set_backup_lib('.')
-    builtins.SIMULATION = True
+    session.simulation = True
     builtins.SPICE = 'spice'
 
 #    builtins.SPICE = 'SPICE'
-    reset()
+    session.circuit.reset(init=True)
 
     scheme = Circuit()
     scheme.units = defaultdict(list)
-    builtins.default_circuit.reset(init=True)
-    del builtins.default_circuit
-    builtins.default_circuit = scheme
+    session.circuit = scheme
     scheme.NC = Net('NC')
     builtins.NC = scheme.NC
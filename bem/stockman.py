@@ -1,6 +1,8 @@
+import numpy as np
+
 from .model import Part
 from .model import Param, Mod, Prop
-from .utils.args import u, is_tolerated, get_arguments, get_params
+from .utils.args import u, u_array, is_tolerated, get_arguments, get_params
 
 class Stockman:
     def __init__(self, block):
@@ -118,6 +120,9 @@ class Stockman:
     def check_param(self, part, param, desire):
         part_params = part.params.where(Param.name == param)
         if part_params.count():
+            if param in self.upper_limit:
+                return self.is_values_enough(desire, [part_param.value for part_param in part_params])
+
             for part_param in part_params:
                 if self.is_value_proper(param, desire, part_param.value):
                     return True
@@ -176,15 +181,13 @@ class Stockman:
         return False
 
     def is_value_enough(self, desire, value, multiple=1):
-        absolute_value = u(value)
-
-        if not isinstance(absolute_value, float):
-            return False
+        return self.is_values_enough(desire, [value], multiple)
 
-        if abs(absolute_value) >= abs(u(desire)) * multiple:
-            return True
+    def is_values_enough(self, desire, values, multiple=1):
+        # Values that aren't numbers are not enough
+        absolute_values = u_array(values, default=np.nan)
 
-        return False
+        return bool(np.any(np.abs(absolute_values) >= abs(u(desire)) * multiple))
 
     def is_units_enough(self, part, units):
         part_units = part.params.where(Param.name == 'units')
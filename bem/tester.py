@@ -1,20 +1,19 @@
 import importlib
 import logging
 from collections import defaultdict
-from pathlib import Path
 import inspect
 
 from bem import Net
 
 from bem import Block, Build, u_s
+from bem.registry import registry
+from bem.utils.structer import library_module, resolution_table
 from .util import get_arg_units, get_minimum_period
 
 from .simulator import Simulate, set_spice_enviroment
 
 import builtins
 
-BLOCKS_PATH = 'blocks'
-
 test_body_kit = [{
     'name': 'basic.RLC',
     'mods': {
@@ -144,24 +143,30 @@ class Test:
         }
 
 
+def block_test_module(table, name):
+    """
+    Test module of block or scope from the first library that has it
+    """
+    for lib in table.libraries:
+        if registry(lib).has_test(name):
+            return importlib.import_module(library_module(lib) + '.' + name + '.test')
+
+
 def BuildTest(Block, *args, **kwargs):
         name = Block.name
         mods = {}
         tests = []
 
-        block_dir = name.replace('.', '/')
-
-        base_file = Path(BLOCKS_PATH) / block_dir / ('__init__.py')
-        base = base_file.exists() and importlib.import_module(BLOCKS_PATH + '.' + name).Base
+        table = resolution_table()
+        entry = table.block(name)
+        base = entry and importlib.import_module(entry[1]).Base
 
-        base_test = Path(BLOCKS_PATH) / block_dir / ('test.py')
-        BaseTest = base_test.exists() and importlib.import_module(BLOCKS_PATH + '.' + name + '.test')
+        BaseTest = block_test_module(table, name)
         if BaseTest:
             tests.append(BaseTest.Case)
         elif name.find('.') != -1:
             parent = name.split('.')[0]
-            base_test = Path(BLOCKS_PATH) / parent / ('test.py')
-            BaseTest = base_test.exists() and importlib.import_module(BLOCKS_PATH + '.' + parent + '.test')
+            BaseTest = block_test_module(table, parent)
             if BaseTest:
                 tests.append(BaseTest.Case)
 
@@ -182,9 +187,9 @@ def BuildTest(Block, *args, **kwargs):
                     values = [str(values)]
 
                 for value in values:
-                    test_file = Path(BLOCKS_PATH) / block_dir / ('_' + mod) / (value + '_test.py')
-                    if test_file.exists():
-                        ModTest = importlib.import_module(BLOCKS_PATH + '.' + name + '._' + mod + '.' + value + '_test')
+                    mod_entry = table.mod(name, mod, value)
+                    if mod_entry and registry(mod_entry[0]).has_mod_test(name, mod, value):
+                        ModTest = importlib.import_module(mod_entry[1] + '_test')
                         tests.append(ModTest.Case)
 
         if len(tests):
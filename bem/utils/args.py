@@ -1,13 +1,14 @@
 from PySpice.Unit import u_s, u_Hz, u_A, u_V
 from PySpice.Unit import FrequencyValue, PeriodValue
-from PySpice.Unit.Unit import UnitValue
+from PySpice.Unit.Unit import UnitValue, UnitValues
 from copy import copy
-from inspect import getargspec, signature as func_signature
+from functools import lru_cache
+from inspect import getargspec, getattr_static, signature as func_signature
 import numpy as np
 import json
 from . import uniq_f7
 from .parser import block_params_description
-from inspect import getmembers, isroutine
+from inspect import isroutine
 
 
 _prefix = {
@@ -18,6 +19,8 @@ _prefix = {
     'p': 1e-12,  # pico
     'n': 1e-9,   # nano
     'u': 1e-6,   # micro
+    'μ': 1e-6,   # micro
+    'µ': 1e-6,   # micro sign
     'm': 1e-3,   # mili
     'c': 1e-2,   # centi
     'd': 1e-1,   # deci
@@ -55,7 +58,89 @@ def u(unit):
             except:
                 return 0
     else:
-        return float(unit.convert_to_power())
+        # The same as float of unit converted to power 0
+        return float(unit)
+
+
+def u_text(text):
+    """Float value of numeric string with SI prefix, `'10 k'`,
+    None if it isn't number
+    """
+    try:
+        scale = _prefix.get(text[-1], None)
+        if scale is not None:
+            return float(text[:-1]) * scale
+
+        return float(text)
+    except (ValueError, IndexError):
+        pass
+
+    # `inf`, `nan` are ended with prefix
+    try:
+        return float(text)
+    except ValueError:
+        return None
+
+
+def u_array(units, default=0.0):
+    """Absolute float64 values of sequence or array, `u` for each element.
+    Elements are PySpice.Unit values, numbers or numeric strings with SI prefix,
+    strings that aren't numbers are `default`.
+    """
+    if isinstance(units, UnitValues):
+        return units.as_ndarray(scale=True).astype(np.float64)
+
+    # Float64 arrays, like range tables, are returned as is
+    if isinstance(units, np.ndarray) and units.dtype.kind in 'biuf':
+        return units.astype(np.float64, copy=False)
+
+    def absolute(unit):
+        kind = type(unit)
+        if kind is float or kind is int:
+            return unit
+        elif kind is str:
+            value = u_text(unit)
+            return default if value is None else value
+        elif isinstance(unit, UnitValue):
+            return unit._value * unit.scale
+        elif isinstance(unit, np.number):
+            return unit
+
+        return u(unit)
+
+    if not isinstance(units, (list, tuple)):
+        units = list(units)
+
+    # Plain numbers are converted by numpy at once
+    if len(units) and type(units[0]) in [int, float]:
+        try:
+            return np.array(units, dtype=np.float64)
+        except (TypeError, ValueError):
+            pass
+
+    return np.fromiter(map(absolute, units), dtype=np.float64, count=len(units))
+
+
+@lru_cache(maxsize=4096)
+def range_values(values):
+    """Sorted unique float64 values of catalog param, parsed once and shared.
+    Range of scales and exponents `'1 2.2 4.7 / k M'` is `1e3, 2.2e3, ... 4.7e6`,
+    exponent is SI prefix or power of 10, `'1 2.2 / 0 3'`.
+    Without `/` values are listed, `'100 220 1k'`.
+    """
+    if values.find('/') > 0:
+        scales, exponents = values.split('/')
+        scales = np.array(scales.split(), dtype=np.float64)
+        exponents = [_prefix[exp] if exp in _prefix else 10.0 ** int(exp) for exp in exponents.split()]
+        table = np.outer(exponents, scales).ravel()
+    else:
+        table = u_array(values.split(), default=np.nan)
+        table = table[~np.isnan(table)]
+
+    table = np.unique(table)
+    table.setflags(write=False)
+
+    return table
 
 
 def is_tolerated(a, b, tollerance=0.1):
@@ -84,19 +169,11 @@ def is_tolerated(a, b, tollerance=0.1):
 
     if isinstance(b, str):
         if b.find('/') > 0:
-            values = []
-            values_range = b.split('/')
-            if len(values_range) > 1:
-                scales, exponenta = values_range
-                for exp in exponenta.strip().split(' '):
-                    scale = np.array(scales.strip().split(' ')).astype(float)
-
-                    values += list(scale * _prefix[exp])
-            b = values
+            b = range_values(b)
         elif isinstance(a, str) and a != b:
             return False
 
-    if type(a) == list and b in a:
+    if type(a) == list and not isinstance(b, np.ndarray) and b in a:
         if isinstance(b, list):
             raise("Not implemented")
 
@@ -104,11 +181,17 @@ def is_tolerated(a, b, tollerance=0.1):
 
     a = normalize(a)
 
-    if isinstance(b, list):
-        b = [normalize(val) for val in b]
+    if isinstance(b, (list, np.ndarray)):
+        try:
+            b = u_array(b)
+        except (AttributeError, TypeError, ValueError):
+            return a in [normalize(val) for val in b]
 
-        if a in b:
-            return True
+        # Values aren't compared with tolerance, list is tolerated by any of its values
+        if isinstance(a, list):
+            return bool(np.any(np.isin(u_array(a, default=np.nan), b)))
+
+        return a in b
     else:
         b = normalize(b)
 
@@ -264,10 +347,122 @@ def default_arguments(block):
     return args, defaults
 
 
+def mount_plan(block):
+    """
+    Ordered `willMount` calls of composed block
+    with accepted arguments and is positional arguments passed.
+    """
+    steps = []
+    positional = True
+
+    # Last class is object
+    # FIXME: Clear builder duplicates
+    classes = [cls for cls in block.classes[:-1] if 'builder' not in str(cls)]
+    for cls in classes:
+        if not hasattr(cls, 'willMount'):
+            continue
+
+        mount = cls.willMount
+        keys = getargspec(mount).args
+        if len(keys) == 1:
+            positional = False
+
+        steps.append((mount, tuple(key for key in keys if key != 'self'), positional))
+
+    return steps
+
+
+def copy_argument(value):
+    """
+    Defensive copy of argument passed to `willMount`,
+    unit values are changed in place by `+=` and `*=`,
+    immutable values are passed as is
+    """
+    if isinstance(value, UnitValue):
+        return value.clone()
+
+    if hasattr(value, 'copy'):
+        return value.copy()
+
+    return value
+
+
+def params_schema(block):
+    """
+    Params and arguments of composed block with kind, unit name
+    of default value and description, built once per class:
+    `{ name: { 'kind': 'argument' | 'value' | 'property' | 'lazy', 'unit': ..., 'description': ... } }`
+    Class values that couldn't be a param, like lists of classes or files,
+    are skipped, properties are evaluated on instance.
+    Lazy params are read from `_<name>` storage, so they are exported
+    only if they are assigned or already resolved.
+    """
+    description = block_params_description(block)
+    defaults = getattr(block, 'defaults', {})
+    arguments = getattr(block, 'arguments', [])
+
+    def unit(value):
+        value = value_to_round(value)
+
+        return value and value['unit']['name']
+
+    schema = {}
+    for arg in arguments:
+        schema[arg] = {
+            'kind': 'argument',
+            'unit': unit(getattr_static(block, arg, defaults.get(arg, None))),
+            'description': description.get(arg, None)
+        }
+
+    lazy_params = [param for param in getattr(block, 'lazy_params', []) if param not in arguments]
+    for param in lazy_params:
+        schema[param] = {
+            'kind': 'lazy',
+            'unit': None,
+            'description': description.get(param, None)
+        }
+
+    black_list = ['name', '__module__'] + arguments + lazy_params
+    for param in dir(block):
+        if param.startswith('_') or param in black_list:
+            continue
+
+        default = getattr_static(block, param)
+        if isinstance(default, (staticmethod, classmethod)) or isroutine(default):
+            continue
+
+        if hasattr(type(default), '__get__'):
+            kind = 'property'
+        elif value_to_round(default):
+            kind = 'value'
+        else:
+            continue
+
+        schema[param] = {
+            'kind': kind,
+            'unit': unit(default) if kind == 'value' else None,
+            'description': description.get(param, None)
+        }
+
+    return schema
+
+
+def block_schema(block):
+    """
+    Schema stored in composed class, instances share it
+    """
+    cls = block if isinstance(block, type) else type(block)
+    schema = vars(cls).get('params_schema', None)
+    if schema is None:
+        schema = cls.params_schema = params_schema(cls)
+
+    return schema
+
+
 def get_arguments(block):
     arguments = {}
 
-    description = block_params_description(block)
+    schema = block_schema(block)
     defaults = getattr(block, 'defaults')
 
     for arg in getattr(block, 'arguments', {}):
@@ -278,28 +473,35 @@ def get_arguments(block):
             default = default[0]
 
         value = value_to_strict(default)
+        description = arg in schema and schema[arg]['description']
         if value:
             arguments[arg] = value
-        if description.get(arg, None) and arguments.get(arg, None):
-            arguments[arg]['description'] = description[arg]
+        if description and arguments.get(arg, None):
+            arguments[arg]['description'] = description
 
     return arguments
 
 
 def get_params(block):
-    params = {}
-    params_default = getmembers(block, lambda a: not (isroutine(a)))
+    """
+    Params from class schema and attributes assigned to instance
+    """
+    schema = block_schema(block)
 
-    description = block_params_description(block)
+    names = [name for name, param in schema.items() if param['kind'] != 'argument']
+    black_list = ['name', '__module__'] + getattr(block, 'arguments', []) + getattr(block, 'lazy_params', [])
+    names += [name for name in vars(block)
+              if name not in schema and not name.startswith('_') and name not in black_list]
 
     params = {}
-    arguments = getattr(block, 'arguments', [])
-    black_list = ['name', '__module__'] + arguments
-    for param, default in params_default:
-        # Skip unrelated attributes
-        # TODO: make faster check
-        if param.startswith('_') \
-                or param in black_list:
+    for param in sorted(names):
+        # Lazy params aren't evaluated for description
+        if schema.get(param, {}).get('kind', None) == 'lazy':
+            default = getattr(block, '_' + param, None)
+        else:
+            default = getattr(block, param, None)
+
+        if isroutine(default):
             continue
 
         value = value_to_round(default)
@@ -307,8 +509,9 @@ def get_params(block):
         if value:
             params[param] = value
 
-        if description.get(param, None) and params.get(param, None):
-            params[param]['description'] = description[param]
+            description = param in schema and schema[param]['description']
+            if description:
+                params[param]['description'] = description
 
     return params
 
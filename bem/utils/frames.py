@@ -0,0 +1,119 @@
+"""
+Capture of `circuit` frames used for refs and notes of inner blocks.
+
+On Python 3.12+ `sys.monitoring` reports returns only of `circuit` code
+objects of the block under construction. On older versions frames are
+registered by blocks created inside of `circuit`, so nothing is traced.
+"""
+import sys
+from contextlib import contextmanager
+from weakref import WeakKeyDictionary, WeakSet
+
+from bem.session import current_session
+
+MONITORING = hasattr(sys, 'monitoring')
+
+# Code objects with enabled return events
+monitored = WeakSet()
+
+# Block class -> code objects of its circuit methods
+codes_cache = WeakKeyDictionary()
+
+
+def circuit_codes(cls) -> tuple:
+    codes = codes_cache.get(cls, None)
+    if codes is not None:
+        return codes
+
+    codes = []
+    for base in cls.__mro__:
+        method = base.__dict__.get('circuit', None)
+        code = getattr(method, '__code__', None)
+        if code is not None:
+            codes.append(code)
+
+    codes = codes_cache[cls] = tuple(codes)
+
+    return codes
+
+
+def capture(frame, block, frames):
+    if frame.f_locals.get('self', None) is block and not any(frame is captured for captured in frames):
+        frames.append(frame)
+
+
+def on_return(code, offset, retval):
+    # Blocks in release of current session with their captured frames,
+    # innermost is last, and is `sys.monitoring` used for capture
+    captures = current_session().captures
+    if captures:
+        block, frames, _ = captures[-1]
+        # Callback is called from frame of returning `circuit`
+        capture(sys._getframe(1), block, frames)
+
+
+def monitoring_tool():
+    monitoring = sys.monitoring
+    # Tool ids not reserved for debugger, coverage, profiler and optimizer
+    for tool in [4, 3]:
+        if monitoring.get_tool(tool) == 'bem':
+            return tool
+
+        if monitoring.get_tool(tool) is None:
+            monitoring.use_tool_id(tool, 'bem')
+            monitoring.register_callback(tool, monitoring.events.PY_RETURN, on_return)
+
+            return tool
+
+    return None
+
+
+def monitor(block) -> bool:
+    tool = monitoring_tool()
+    if tool is None:
+        return False
+
+    for code in circuit_codes(block.__class__):
+        if code not in monitored:
+            sys.monitoring.set_local_events(tool, code, sys.monitoring.events.PY_RETURN)
+            monitored.add(code)
+
+    return True
+
+
+@contextmanager
+def capture_frames(block):
+    """
+    Collect frames of `block.circuit` methods executed inside of context
+    """
+    frames = []
+    captures = current_session().captures
+    captures.append((block, frames, MONITORING and monitor(block)))
+
+    try:
+        yield frames
+    finally:
+        captures.pop()
+
+
+def register_caller():
+    """
+    Fallback without `sys.monitoring`, called on block creation to
+    register `circuit` frame of building block where instance is created.
+    Frames of `circuit` without created blocks aren't captured.
+    """
+    captures = current_session().captures
+    if not captures or captures[-1][2]:
+        return
+
+    block, frames, _ = captures[-1]
+    codes = circuit_codes(block.__class__)
+
+    frame = sys._getframe(2)
+    while frame is not None:
+        if frame.f_code in codes:
+            capture(frame, block, frames)
+
+            return
+
+        frame = frame.f_back
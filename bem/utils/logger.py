@@ -1,21 +1,82 @@
+import atexit
 import logging
+import warnings
 from collections import deque
+from functools import lru_cache
+from logging.handlers import QueueHandler, QueueListener
+from os import getenv, path
+from queue import SimpleQueue
+from typing import Dict, Tuple
+
 from .args import get_params
 
+# Log file -> handler of logger and listener writing to file in thread
+queues: Dict[str, Tuple[QueueHandler, QueueListener]] = {}
+
+
+def log_queue(filename: str) -> QueueHandler:
+    """
+    Handler that passes records to thread writing log file, one per file
+    """
+    if filename not in queues:
+        file_handler = logging.FileHandler(filename, delay=True)
+        formatter = logging.Formatter('%(asctime)s %(levelname)s - %(message)s')
+        file_handler.setFormatter(formatter)
+
+        queue = SimpleQueue()
+        listener = QueueListener(queue, file_handler)
+        listener.start()
+        atexit.register(listener.stop)
+
+        queues[filename] = (QueueHandler(queue), listener)
+
+    return queues[filename][0]
+
+
+def log_level():
+    """
+    Level name or number from `BEM_LOG_LEVEL`, INFO if it isn't valid
+    """
+    level = getenv('BEM_LOG_LEVEL', 'INFO').strip().upper()
+    if level.isdigit():
+        return int(level)
+
+    if isinstance(logging.getLevelName(level), int):
+        return level
+
+    warnings.warn("Unknown BEM_LOG_LEVEL '%s', INFO is used" % level)
+
+    return logging.INFO
+
 
 def logger_init(name, filename='bem.log'):
     logging.setLoggerClass(logging.Logger)
-    log = logging.getLogger(__name__)
-    log.setLevel(logging.INFO)
-    log_handler = logging.FileHandler(filename)
+    log = logging.getLogger(name)
+    log.setLevel(log_level())
 
-    formatter = logging.Formatter('%(asctime)s %(levelname)s - %(message)s')
-    log_handler.setFormatter(formatter)
-    log.addHandler(log_handler)
+    handler = log_queue(filename)
+    if handler not in log.handlers:
+        log.addHandler(handler)
 
     return log
 
 
+def log_enabled(log, level=logging.INFO) -> bool:
+    """
+    Messages should be built only if logging is enabled by DEBUG and level
+    """
+    return bool(DEBUG) and log.isEnabledFor(level)
+
+
+@lru_cache(maxsize=1024)
+def code_anchor(code) -> str:
+    return "[%s:%i:%s] - " % (
+        path.basename(path.dirname(code.co_filename)) + '/' + path.basename(code.co_filename),
+        code.co_firstlineno,
+        code.co_name
+    )
+
+
 # ERC Logger grabber
 class TailLogHandler(logging.Handler):
     def __init__(self, log_queue):
@@ -1,13 +1,203 @@
-from inspect import getsourcelines, getouterframes, linecache
-from IPython.core.magics.code import extract_symbols
+from inspect import getsourcelines, linecache
 
 import builtins
+import os
 import re
-from functools import reduce
+from collections import OrderedDict
+from functools import lru_cache, reduce
 from sys import _getframe as getframe
-import inspect, sys
+from typing import Dict, List, Optional, Tuple
 
 
+class Source(list):
+    """
+    Source lines with pre-parsed index:
+    * stripped -- lines without spaces
+    * assignments -- first line where name is assigned, `name=...`
+    * comments -- comment text of each line
+    """
+    def __init__(self, lines: List[str], mtime: Optional[int] = None):
+        super().__init__(lines)
+
+        self.mtime = mtime
+        self.stripped: List[str] = [line.replace(' ', '') for line in lines]
+        self.assignments: Dict[str, int] = {}
+        self.comments: List[str] = []
+
+        for index, line in enumerate(lines):
+            stripped = self.stripped[index].strip()
+            assign_pos = stripped.find('=')
+            if assign_pos > 0:
+                self.assignments.setdefault(stripped[:assign_pos], index)
+
+            comment_pos = line.find('#')
+            self.comments.append(line[comment_pos + 1:].strip() if comment_pos != -1 else '')
+
+
+# Sources of code objects by (co_filename, co_firstlineno),
+# least recently used are dropped
+SOURCES_SIZE = 1024
+sources: 'OrderedDict[Tuple[str, int], Source]' = OrderedDict()
+
+
+def source_lines(code) -> Source:
+    """
+    Source of code object, reused while file mtime is unchanged.
+    Raise OSError if source isn't available.
+    """
+    key = (code.co_filename, code.co_firstlineno)
+    try:
+        mtime = os.stat(code.co_filename).st_mtime_ns
+    except OSError:
+        mtime = None
+
+    source = sources.get(key, None)
+    if source is not None and source.mtime == mtime:
+        sources.move_to_end(key)
+
+        return source
+
+    linecache.checkcache(code.co_filename)
+    source = sources[key] = Source(getsourcelines(code)[0], mtime)
+    sources.move_to_end(key)
+    while len(sources) > SOURCES_SIZE:
+        sources.popitem(last=False)
+
+    return source
+
+
+@lru_cache(maxsize=8)
+def text_source(text: str) -> Source:
+    """
+    Source of code passed as text, `builtins.code` for shell sessions
+    """
+    return Source(text.split('\n'))
+
+
+class NoteRef:
+    """
+    Comments of source lines resolved to text on demand, when notes
+    are exported. `source` is `Source` with `start` and `end` indexes
+    or code object with absolute line numbers.
+    """
+    def __init__(self, source, start: int, end: int):
+        self.source = source
+        self.start = start
+        self.end = end
+
+        # Code of shell session could be replaced until resolve
+        self.text = getattr(builtins, 'code', '') if not isinstance(source, Source) else ''
+        self.notes: Optional[List[str]] = None
+
+    @property
+    def key(self) -> tuple:
+        source = id(self.source) if isinstance(self.source, Source) else self.source
+
+        return (self.__class__, source, self.start, self.end)
+
+    def lines(self) -> Tuple[Optional[Source], int, int]:
+        if isinstance(self.source, Source):
+            return self.source, self.start, self.end
+
+        try:
+            offset = self.source.co_firstlineno
+            source = source_lines(self.source)
+        except OSError:
+            if not self.text:
+                return None, 0, 0
+
+            offset = 1
+            source = text_source(self.text)
+
+        return source, self.start - offset, self.end - offset
+
+    def resolve(self) -> List[str]:
+        if self.notes is None:
+            source, start, end = self.lines()
+            self.notes = inspect_comments(source, start, end) if source else []
+
+        return self.notes
+
+    def __str__(self):
+        return '\n'.join(self.resolve())
+
+    def __repr__(self):
+        return repr(str(self))
+
+    # Compared and hashed as resolved text, equal to the same `str`,
+    # `uniq_notes` deduplicates references without resolving
+    def __eq__(self, other):
+        if isinstance(other, (NoteRef, str)):
+            return str(self) == str(other)
+
+        return NotImplemented
+
+    def __hash__(self):
+        return hash(str(self))
+
+    # Notes are copied with skidl parts
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+
+class AssignmentNote(NoteRef):
+    """
+    Comments of line where `name` is assigned in code object
+    """
+    def __init__(self, code, name: str):
+        super().__init__(code, 0, 0)
+
+        self.name = name
+
+    @property
+    def key(self) -> tuple:
+        return (self.__class__, self.source, self.name)
+
+    def lines(self) -> Tuple[Optional[Source], int, int]:
+        source, _, _ = super().lines()
+        index = source.assignments.get(self.name, None) if source else None
+        if index is None:
+            return None, 0, 0
+
+        return source, index, index
+
+
+def uniq_notes(notes) -> list:
+    """
+    Notes without duplicates in order of appearance,
+    references are compared by source position and aren't resolved
+    """
+    seen = set()
+    unique = []
+    for note in notes:
+        key = note.key if isinstance(note, NoteRef) else note
+        if key not in seen:
+            seen.add(key)
+            unique.append(note)
+
+    return unique
+
+
+def resolve_notes(notes, unique=False) -> List[str]:
+    """
+    Text of notes with resolved `NoteRef`
+    """
+    resolved = []
+    for note in notes:
+        if isinstance(note, NoteRef):
+            resolved.extend(note.resolve())
+        else:
+            resolved.append(note)
+
+    if unique:
+        seen = set()
+        resolved = [note for note in resolved if not (note in seen or seen.add(note))]
+
+    return resolved
+
 
 def inspect_code(instance, frame):
     ref = None
@@ -29,9 +219,7 @@ def inspect_code(instance, frame):
 
         try:
             # FIXME: Detect source of execution
-            cell_code = linecache.getlines(inspect.getfile(frame))
-            code = cell_code
-            code = getsourcelines(frame.f_code)[0]
+            code = source_lines(frame.f_code)
 
             code_line = frame.f_lineno - frame.f_code.co_firstlineno
         except OSError:
@@ -46,7 +234,7 @@ def inspect_code(instance, frame):
             if not hasattr(builtins, 'code'):
                 return context
 
-            code = builtins.code.split('\n')
+            code = text_source(builtins.code)
             code_line = frame.f_lineno - 1
 
         context = {
@@ -62,8 +250,7 @@ def inspect_code(instance, frame):
         parentheses_close_pos = context['code'].find(')')
 
         # In code there aren't method call, lookup code for local variable
-        code_part = [line.replace(' ', '') for line in code[0:code_line]]
-        code_part.reverse()
+        code_part = code.stripped[code_line - 1::-1] if code_line > 0 else []
 
         if parentheses_open_pos == -1 or (context['code'].find('=') == -1 and parentheses_open_pos > parentheses_close_pos):
             local_vars = frame.f_code.co_varnames[1:]
@@ -128,13 +315,17 @@ def inspect_comments(code, start, end):
     while start > 0 and code[start - 1].strip().find('#') == 0:
         start -= 1
 
+    comments = getattr(code, 'comments', None)
     for line_number in range(start, end + 1):
-        line = code[line_number]
-        has_comment = line.find('#')
-        if has_comment != -1:
-            comment = line[has_comment + 1:].strip()
-            if comment:
-                notes.append(comment)
+        if comments is not None:
+            comment = comments[line_number]
+        else:
+            line = code[line_number]
+            has_comment = line.find('#')
+            comment = line[has_comment + 1:].strip() if has_comment != -1 else ''
+
+        if comment:
+            notes.append(comment)
 
     notes.reverse()
 
@@ -142,46 +333,62 @@ def inspect_comments(code, start, end):
 
 
 def trace_call_comment(depth=1):
+    if not INSPECT:
+        return []
+
     frame = getframe(depth)
     if frame.f_code.co_name != 'circuit':
         frame = getframe(depth + 1)
 
-    # Search in code
-    code = []
-    notes = []
-    try:
-        code = getsourcelines(frame.f_code)[0]
-        code_line = frame.f_lineno - frame.f_code.co_firstlineno
-    except OSError:
-        if hasattr(builtins, 'code'):
-            code = builtins.code.split('\n')
-            code_line = frame.f_lineno - 1
+    # Comments are parsed when notes are exported
+    return [NoteRef(frame.f_code, frame.f_lineno, frame.f_lineno)]
 
-    if len(code):
-        notes = inspect_comments(code, code_line, code_line)
 
-    return notes
+# Patterns used for refs
+REF_BRACKETS = re.compile(r"[\(\[].*?[\)\]]")
+REF_PARENTHESES = re.compile('[(){}<>]')
+REF_UPPER = re.compile('[A-Z]+')
+REF_TOKEN = re.compile('[A-Z0-9][^A-Z0-9]*')
+REF_CAPITALS = re.compile('[A-Z0-9]+')
+
+
+def short_tokens(origin_ref, length=4):
+    tokens = REF_TOKEN.findall(origin_ref)
+    short_name = ''.join([token[0:length] for token in tokens])
+    return short_name
 
 
 def inspect_ref(block):
     """
     Ref extracted from code variable name
     """
-    origin_ref = ref = getattr(block, 'ref', '')
-    name: str = ref or getattr(block, 'name', '')
+    origin_ref = getattr(block, 'ref', '')
+    name: str = origin_ref or getattr(block, 'name', '')
     name = name.split('.')[-1]
 
     context = block.context
     code = context['code']
     caller = context['caller']
 
+    caller_ref = None
+    if caller and hasattr(caller, 'name') and not hasattr(caller, 'root'):
+        caller_ref = caller.ref
+
+    return code_ref(code, name, origin_ref, caller_ref)
+
+
+@lru_cache(maxsize=4096)
+def code_ref(code, name, origin_ref, caller_ref):
+    """
+    Ref from code line where block is created, shortened to 7 chars
+    """
     assign_pos = code.find('=')
     and_pos = code.find('&')
     or_pos = code.find('|')
     parentheses_pos = code.find('(')
     ref = code[:assign_pos].strip().replace('self', '')
-    ref = re.sub("[\(\[].*?[\)\]]", "", ref)
-    ref = re.sub('[(){}<>]', '', ref)
+    ref = REF_BRACKETS.sub("", ref)
+    ref = REF_PARENTHESES.sub('', ref)
     ref = ref.strip().capitalize()
     value = code[assign_pos:]
     ref = ''.join([word.capitalize() for word
@@ -193,17 +400,12 @@ def inspect_ref(block):
     if assign_pos == -1 or code.find('return') != -1 or (and_pos != -1 and assign_pos > and_pos) or (or_pos != -1 and assign_pos > or_pos) or value == code:
         ref = name
 
-    if caller and hasattr(caller, 'name') and not hasattr(caller, 'root'):
-        block_name = caller.ref.split('.')[-1]
+    if caller_ref is not None:
+        block_name = caller_ref.split('.')[-1]
         #if block_name not in ref:
-        short_name = ''.join(re.findall('[A-Z]+', block_name))
+        short_name = ''.join(REF_UPPER.findall(block_name))
         ref = short_name + '_' + ref
 
-    def short_tokens(origin_ref, length=4):
-        tokens = re.findall('[A-Z0-9][^A-Z0-9]*', origin_ref)
-        short_name = ''.join([token[0:length] for token in tokens])
-        return short_name
-
     refs = [short_tokens(ref)]
     if origin_ref:
         short_name = short_tokens(origin_ref)
@@ -218,28 +420,46 @@ def inspect_ref(block):
         total_ref = short_tokens(total_ref)
 
     if len(ref) > 7:
-        total_ref = ''.join(re.findall('[A-Z0-9]+', total_ref))
+        total_ref = ''.join(REF_CAPITALS.findall(total_ref))
 
     return total_ref
 
-    # FIXME: Make a better
 
-    if len(ref) > 7:
-        total_ref = total_ref.replace('_', '')
+@lru_cache(maxsize=4096)
+def inner_ref(name, key, split=True):
+    """
+    Ref of block assigned to `key` variable inside of `name` block,
+    shortened to 6 chars. Shortened `name` is returned too.
+    """
+    key = ''.join([word.capitalize() for word
+                   in key.replace('_', '.').split('.')])
 
-    if len(total_ref) > 7:
-        total_ref = short_tokens(total_ref)
+    ref = key
+    if split:
+        ref = name + '_' + key
 
-    if len(total_ref) > 7:
-        total_ref = short_tokens(total_ref, 3)
+    if len(ref) > 6:
+        name = name.replace('_', '')
+        ref = name + '_' + key
 
-    if len(total_ref) > 7:
-        total_ref = short_tokens(total_ref, 2)
+    if len(ref) > 6:
+        name = short_tokens(name, 3)
+        ref = name + key
 
-    if len(total_ref) > 7:
-        total_ref = ''.join(re.findall('[A-Z0-9]+', total_ref))
+    if len(ref) > 6:
+        ref = name + short_tokens(key, 3)
 
-    return total_ref
+    if len(ref) > 6:
+        name = short_tokens(name, 2)
+        ref = name + short_tokens(key, 3)
+
+    if len(ref) > 6:
+        ref = short_tokens(name, 2) + short_tokens(key, 2)
+
+    if len(ref) > 6:
+        ref = ''.join(REF_CAPITALS.findall(ref))
+
+    return ref, name
 
 
 def block_ref(block):
@@ -249,48 +469,65 @@ def block_ref(block):
         return getattr(block, 'ref', '') + ' / ' + str(block)
 
 
-def block_description(block):
+@lru_cache(maxsize=1024)
+def parse_description(doc: str) -> str:
+    return '\n'.join([line.strip() for line in doc.split('\n')])
+
+
+@lru_cache(maxsize=1024)
+def parse_params_description(doc: str) -> Tuple[Tuple[str, str], ...]:
     """
-    From docsting of classes builded from.
+    Terms of docstring with pattern 'some_arg -- description'
     """
-    description = []
-    for doc in [cls.__doc__ for cls in block.classes if cls.__doc__ and cls != object]:
-        doc = '\n'.join([line.strip() for line in doc.split('\n')])
-        description.append(doc)
+    terms = [line.strip().split(' -- ') for line in doc.split('\n')
+             if len(line.strip())]
 
-    return description
+    return tuple((term.strip(), description.strip()) for term, description in terms)
 
 
-def block_params_description(block):
+def class_descriptions(block) -> Tuple[List[str], Dict[str, str]]:
     """
-    Get documentation from docstring of methods in `self.doc_methods`
-    using pattern 'some_arg -- description'
+    Descriptions of block and its params parsed from docstrings
+    of classes builded from. Composed class stores them in `class_description`
+    and `params_description` from `Build.block`, other classes on first use.
     """
-    def extract_doc(cls):
-        doc = ''
+    cls = block if isinstance(block, type) else type(block)
+    attrs = vars(cls)
+    if 'class_description' in attrs and 'params_description' in attrs:
+        return attrs['class_description'], attrs['params_description']
 
-        if cls == object:
-            return doc
+    description = [parse_description(base.__doc__) for base in block.classes
+                   if base.__doc__ and base != object]
+
+    params = {}
+    for base in block.classes:
+        if base == object:
+            continue
 
-        for method in block.doc_methods:
-            doc_str = hasattr(cls, method) and getattr(cls, method).__doc__
+        for method in getattr(block, 'doc_methods', []):
+            doc_str = hasattr(base, method) and getattr(base, method).__doc__
             if doc_str:
-                doc += doc_str
+                params.update(parse_params_description(doc_str))
 
-        return doc
+    if hasattr(cls, 'classes'):
+        cls.class_description, cls.params_description = description, params
 
-    params = {}
+    return description, params
 
-    docs = [extract_doc(cls) for cls in block.classes]
 
-    for doc in docs:
-        terms = [line.strip().split(' -- ') for line in doc.split('\n')
-                 if len(line.strip())]
+def block_description(block):
+    """
+    From docsting of classes builded from.
+    """
+    return list(class_descriptions(block)[0])
 
-        for term, description in terms:
-            params[term.strip()] = description.strip()
 
-    return params
+def block_params_description(block):
+    """
+    Get documentation from docstring of methods in `self.doc_methods`
+    using pattern 'some_arg -- description'
+    """
+    return dict(class_descriptions(block)[1])
 
 
 def deep_get(dictionary, keys, default=None):
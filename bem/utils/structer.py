@@ -1,14 +1,22 @@
+import sys
+from hashlib import sha1
 from importlib import import_module
-from os import getenv
+from importlib.machinery import ModuleSpec
+from importlib.util import find_spec, module_from_spec, spec_from_file_location
+from os import getenv, pathsep
 from os.path import dirname
 from pathlib import Path
 from inspect import getmro
+from keyword import iskeyword
 from skidl import Part
+from bem.registry import registry, invalidate as invalidate_registry
+from bem.scope import Scope
 from bem.utils.analyzer import Line, assume_line_type, assume_airwire_direction, is_line_power
-from typing import List
-import json
+from typing import Any, List, Tuple
 from functools import lru_cache
 
+FrozenMods = Tuple[Tuple[str, Any], ...]
+
 
 def bem_blocks_path():
     module_path = dirname(__file__)
@@ -16,36 +24,265 @@ def bem_blocks_path():
 
     return blocks_path
 
+
+def libraries() -> List[str]:
+    """
+    Libraries in order of precedence: `BEM_LIBRARIES` paths separated
+    by `os.pathsep` (or local `blocks`), bundled blocks are the last.
+    """
+    paths = getenv('BEM_LIBRARIES')
+    paths = [path for path in paths.split(pathsep) if path] if paths else ['blocks']
+
+    return paths + [bem_blocks_path()]
+
+
+def library_package(lib: str, root: Path) -> bool:
+    """
+    Library path like local `blocks` is imported with its own name,
+    when the name isn't taken by other package.
+    """
+    if Path(lib).is_absolute() or len(Path(lib).parts) != 1 or not lib.isidentifier() or iskeyword(lib):
+        return False
+
+    module = sys.modules.get(lib, None)
+    if module is not None:
+        locations = getattr(module, '__path__', None) or []
+    else:
+        spec = find_spec(lib)
+        locations = (spec.submodule_search_locations or []) if spec else [str(root)]
+
+    return root in [Path(location).resolve() for location in locations]
+
+
+def library_module(lib: str) -> str:
+    """
+    Package of library modules. Local library like `blocks` keeps
+    its name, so `blocks.*` classes are the same as in composed blocks.
+    Other libraries are imported as package keyed by resolved path,
+    `sys.path` isn't changed, so libraries with the same directory name
+    don't shadow each other.
+    """
+    root = Path(lib).resolve()
+    if root == Path(bem_blocks_path()).resolve():
+        return 'bem.blocks'
+
+    if library_package(lib, root):
+        name = lib
+    else:
+        name = 'bem_library_' + sha1(str(root).encode('utf-8')).hexdigest()[:16]
+
+    if name not in sys.modules:
+        init = root / '__init__.py'
+        if init.is_file():
+            spec = spec_from_file_location(name, init, submodule_search_locations=[str(root)])
+        else:
+            spec = ModuleSpec(name, None, is_package=True)
+            spec.submodule_search_locations = [str(root)]
+
+        module = module_from_spec(spec)
+        sys.modules[name] = module
+        if spec.loader:
+            try:
+                spec.loader.exec_module(module)
+            except BaseException:
+                del sys.modules[name]
+                raise
+
+    return name
+
+
+class ResolutionTable:
+    """
+    Resolution of blocks and modificators over libraries built once:
+    * blocks -- name -> (library, module path, file)
+    * mods -- (name, mod, value) -> (library, module path, file)
+
+    Block or modificator from library earlier in the list takes precedence.
+    """
+    def __init__(self, paths: List[str]):
+        self.libraries = paths
+        self.hits = 0
+        self.misses = 0
+
+        self.build()
+
+    def build(self):
+        blocks = {}
+        mods = {}
+
+        for lib in reversed(self.libraries):
+            module = library_module(lib)
+            for name, block in registry(lib).blocks.items():
+                block_dir = Path(lib) / name.replace('.', '/')
+                block_module = module + '.' + name
+                blocks[name] = (lib, block_module, block_dir / '__init__.py')
+
+                for mod, values in block['mods'].items():
+                    for value in values:
+                        mods[(name, mod, value)] = (lib,
+                                                    block_module + '._' + mod + '.' + value,
+                                                    block_dir / ('_' + mod) / (value + '.py'))
+
+        self.blocks = blocks
+        self.mods = mods
+
+    def lookup(self, table: str, key, parts: List[str]):
+        entry = getattr(self, table).get(key, None)
+        # Library could be changed after table is built
+        if not entry and any([registry(lib).recheck(parts) for lib in self.libraries]):
+            self.build()
+            entry = getattr(self, table).get(key, None)
+
+        if entry:
+            self.hits += 1
+        else:
+            self.misses += 1
+
+        return entry
+
+    def block(self, name: str):
+        return self.lookup('blocks', name, name.split('.'))
+
+    def mod(self, name: str, mod: str, value: str):
+        return self.lookup('mods', (name, mod, str(value)), name.split('.') + ['_' + mod])
+
+    def invalidate(self):
+        for lib in self.libraries:
+            invalidate_registry(lib)
+
+        self.build()
+
+
+resolution = None
+
+
+def resolution_table() -> ResolutionTable:
+    global resolution
+
+    if resolution is None:
+        resolution = ResolutionTable(libraries())
+
+    return resolution
+
+
+def invalidate_resolution():
+    """
+    Rescan libraries and drop cached block and modificator classes.
+    `BEM_LIBRARIES` is read again.
+    """
+    global resolution
+
+    if resolution is not None:
+        resolution.invalidate()
+
+    if resolution is None or resolution.libraries != libraries():
+        resolution = ResolutionTable(libraries())
+
+    get_block_class.cache_clear()
+    get_mod_classes.cache_clear()
+
+
 @lru_cache
 def get_block_class(name: str):
     return lookup_block_class(name)
 
-def lookup_block_class(name: str, libraries: List[str]=[]):
-    bem_blocks = bem_blocks_path()
-    libraries += getenv('BEM_LIBRARIES') or ['blocks']
-    libraries.append(bem_blocks)
+def lookup_block_class(name: str):
+    entry = resolution_table().block(name)
+    if not entry:
+        return None, None
 
-    block_dir = name.replace('.', '/')
-    base_file = block_class = module_path = None
+    lib, module_path, base_file = entry
+    block_class = import_module(module_path).Base
 
-    for lib in libraries:
-        base_file = Path(lib) / block_dir / ('__init__.py')
+    return base_file, block_class
 
-        if base_file.exists():
-            if lib == bem_blocks:
-                module_path = 'bem.blocks'
-            else:
-                module_path = lib
 
-            break
+class FrozenDict(tuple):
+    """
+    Items of dict value, thawed back to dict
+    """
 
 
-    if base_file and base_file.exists():
-        block_class = import_module(module_path + '.' + name).Base
-    else:
-        return None, None
+class FrozenSet(frozenset):
+    """
+    Items of set value, thawed back to set
+    """
 
-    return base_file, block_class
+
+class Unique:
+    """
+    Unhashable value compared by identity, reference is kept,
+    so different values never share a key
+    """
+    __slots__ = ['value']
+
+    def __init__(self, value):
+        self.value = value
+
+    def __eq__(self, other):
+        return isinstance(other, Unique) and other.value is self.value
+
+    def __hash__(self):
+        return id(self.value)
+
+    def __repr__(self):
+        return 'Unique(%r)' % (self.value,)
+
+
+def freeze_value(value):
+    if isinstance(value, (list, tuple)):
+        return tuple(freeze_value(item) for item in value)
+
+    if isinstance(value, dict):
+        return FrozenDict((key, freeze_value(item)) for key, item in value.items())
+
+    if isinstance(value, set):
+        return FrozenSet(freeze_value(item) for item in value)
+
+    try:
+        hash(value)
+    except TypeError:
+        return Unique(value)
+
+    return value
+
+
+def thaw_value(value):
+    if isinstance(value, FrozenDict):
+        return {key: thaw_value(item) for key, item in value}
+
+    if isinstance(value, FrozenSet):
+        return {thaw_value(item) for item in value}
+
+    if isinstance(value, tuple):
+        return [thaw_value(item) for item in value]
+
+    if isinstance(value, Unique):
+        return value.value
+
+    return value
+
+
+def freeze_mods(mods) -> FrozenMods:
+    """
+    Hashable form of mods or props request.
+    Order of keys and values is kept, modificators are composed in it.
+    Lists become tuples, dicts and sets are frozen recursively,
+    other unhashable values are compared by identity.
+    `{ 'size': ['small', 'big'], 'port': 'one' }` -> `(('size', ('small', 'big')), ('port', 'one'))`
+    """
+    return tuple((key, freeze_value(value)) for key, value in mods.items())
+
+
+def sorted_mods(mods) -> FrozenMods:
+    """
+    Frozen mods with sorted keys, for keys where order of request doesn't matter
+    """
+    return tuple(sorted(freeze_mods(mods), key=lambda item: item[0]))
+
+
+def thaw_mods(frozen: FrozenMods):
+    return {key: thaw_value(value) for key, value in frozen}
 
 
 def mods_from_dict(kwargs):
@@ -81,17 +318,12 @@ def mods_predefined(base):
     return mods
 
 @lru_cache
-def get_mod_classes(name: str, selected_mods: str):
-    mods = json.loads(selected_mods)
+def get_mod_classes(name: str, selected_mods: FrozenMods):
+    mods = thaw_mods(selected_mods)
     return lookup_mod_classes(name, mods)
 
-def lookup_mod_classes(name: str, selected_mods, libraries=[]):
-    bem_blocks = bem_blocks_path()
-    libraries += getenv('BEM_LIBRARIES') or ['blocks']
-    libraries.append(bem_blocks)
-
-    block_dir = name.replace('.', '/')
-    mod_file = module_path = None
+def lookup_mod_classes(name: str, selected_mods):
+    table = resolution_table()
     classes = []
     files = []
     mods = {}
@@ -101,52 +333,63 @@ def lookup_mod_classes(name: str, selected_mods, libraries=[]):
             values = [str(values)]
 
         for value in values:
-            for lib in libraries:
-                mod_file = Path(lib) / block_dir / ('_' + mod) / (str(value) + '.py')
-                if mod_file.exists():
-                    if lib == bem_blocks:
-                        module_path = 'bem.blocks'
-                    else:
-                        module_path = lib
+            entry = table.mod(name, mod, value)
+            if not entry:
+                continue
 
-                    break
+            lib, module_path, mod_file = entry
+            Module = import_module(module_path)
+            classes.append(Module.Modificator)
+            files.append(str(mod_file))
 
-            if mod_file and mod_file.exists():
-                mod_file = Path(lib) / block_dir / ('_' + mod) / (str(value) + '.py')
-                Module = import_module(module_path + '.' + block_dir.replace('/', '.') + '._' + mod + '.' + value)
-                classes.append(Module.Modificator)
-                files.append(str(mod_file))
+            if hasattr(Module.Modificator, 'files'):
+                files += Module.Modificator.files
 
-                if hasattr(Module.Modificator, 'files'):
-                    files += Module.Modificator.files
+            instance_mods = Module.Modificator.mods if hasattr(Module.Modificator, 'mods') else {}
+            mods = {
+                **mods,
+                **instance_mods,
+                mod: values
+            }
 
-                instance_mods = Module.Modificator.mods if hasattr(Module.Modificator, 'mods') else {}
-                mods = {
-                    **mods,
-                    **instance_mods,
-                    mod: values
-                }
+    return files, classes, mods
 
 
-    return files, classes, mods
+def graph_ref(block):
+    if not hasattr(block, 'part') and block:
+        return block.ref
+    else:
+        return ' ' + getattr(block, 'ref', '_')
+
+
+def scope_graph(scope):
+    """
+    Graph of refs built from owner -> children index of scope
+    and refs that have absolutely no parent
+    """
+    if not isinstance(scope, Scope):
+        scope = Scope(scope)
+
+    graph = {}
+    has_parent = {}
+    for owner_id, children in scope.children.items():
+        parent = graph_ref(scope.owners[owner_id])
+        graph.setdefault(parent, set())
+        has_parent.setdefault(parent, False)
+
+        for child in children:
+            name = graph_ref(child)
+            graph[parent].add(name)
+            graph.setdefault(name, set())
+            has_parent[name] = True
 
+    roots = [name for name, parents in has_parent.items() if not parents]
 
-def hierarchy(Block):
-    def block_ref(block):
-        if not hasattr(block, 'part') and block:
-            return block.ref
-        else:
-            return ' ' + getattr(block, 'ref', '_')
+    return graph, roots
 
-    lst = [(block_ref(item[0]), block_ref(item[1])) for item in Block.scope]
-    graph = {name: set() for tup in lst for name in tup}
-    has_parent = {name: False for tup in lst for name in tup}
-    for parent, child in lst:
-        graph[parent].add(child)
-        has_parent[child] = True
 
-    # All names that have absolutely no parent:
-    roots = [name for name, parents in has_parent.items() if not parents]
+def hierarchy(Block):
+    graph, roots = scope_graph(Block.scope)
 
     # traversal of the graph (doesn't care about duplicates and cycles)
     def traverse(hierarchy, graph, names):
@@ -162,21 +405,7 @@ def hierarchy(Block):
     return root['_']
 
 def hierarchy_joined(Block):
-    def block_ref(block):
-        if not hasattr(block, 'part') and block:
-            return block.ref
-        else:
-            return ' ' + getattr(block, 'ref', '_')
-
-    lst = [(block_ref(item[0]), block_ref(item[1])) for item in Block.scope]
-    graph = {name: set() for tup in lst for name in tup}
-    has_parent = {name: False for tup in lst for name in tup}
-    for parent, child in lst:
-        graph[parent].add(child)
-        has_parent[child] = True
-
-    # All names that have absolutely no parent:
-    roots = [name for name, parents in has_parent.items() if not parents]
+    graph, roots = scope_graph(Block.scope)
 
     # traversal of the graph (doesn't care about duplicates and cycles)
     def traverse(hierarchy, graph, names):
@@ -198,28 +427,9 @@ def hierarchy_joined(Block):
 
 
 def contents(Block):
-    def block_ref(block):
-        if not hasattr(block, 'part') and block:
-            return block.ref
-        else:
-            return ' ' + getattr(block, 'ref', '_')
-
-    lst = []
-    parts = {}
-
-    for builder, entry in Block.scope:
-        lst.append((block_ref(builder), block_ref(entry)))
-        if isinstance(entry, Part):
-            parts[block_ref(entry)] = entry
-
-    graph = {name: set() for tup in lst for name in tup}
-    has_parent = {name: False for tup in lst for name in tup}
-    for parent, child in lst:
-        graph[parent].add(child)
-        has_parent[child] = True
-
-    # All names that have absolutely no parent:
-    roots = [name for name, parents in has_parent.items() if not parents]
+    scope = Block.scope if isinstance(Block.scope, Scope) else Scope(Block.scope)
+    graph, roots = scope_graph(scope)
+    parts = {graph_ref(part): part for part in scope.blocks_of_type(Part)}
 
     # traversal of the graph (doesn't care about duplicates and cycles)
     def traverse(hierarchy, graph, names):
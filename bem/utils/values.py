@@ -0,0 +1,256 @@
+"""
+Index of available values for closest value search
+and synthesis of values by combination of parts.
+
+Values are kept sorted and unique in float64 array, so closest, floor,
+ceil and tolerance queries are answered by `searchsorted` for one target
+or for array of targets at once:
+
+    index = ValueIndex(range_values('1 2.2 4.7 / k M'))
+    index.closest(3000) -> 2200.0
+    index.closest([3000, 4e6]) -> [2200.0, 4.7e6]
+
+Combination of parts is tree of `('sum', [...])` and `('reciprocal', [...])`
+with values in leaves. Values are summed for resistors in series and
+capacitors in parallel, reciprocal is sum of reciprocals for resistors in
+parallel and capacitors in series:
+
+    synthesize(index, 3300, tolerance=0.01) -> (3300.0, ('sum', [1000.0, 2200.0]))
+"""
+from collections import OrderedDict
+from typing import Dict, Iterable, Optional, Tuple, Union
+
+import numpy as np
+
+from .args import u_array
+
+Tree = Union[float, Tuple[str, list]]
+
+# Pairs tables take O(n²) memory, they are built only for indexes
+# up to PAIRS_VALUES values and kept for PAIRS_INDEXES recently used indexes
+PAIRS_VALUES = 1024
+PAIRS_INDEXES = 4
+paired: 'OrderedDict[int, ValueIndex]' = OrderedDict()
+
+
+def nearest(values: np.ndarray, targets: np.ndarray) -> np.ndarray:
+    """
+    Indexes of the closest values in sorted array,
+    the lower one if both are the same far
+    """
+    upper = np.searchsorted(values, targets, side='left').clip(0, len(values) - 1)
+    lower = (upper - 1).clip(0)
+    is_upper = np.abs(values[upper] - targets) < np.abs(targets - values[lower])
+
+    return np.where(is_upper, upper, lower)
+
+
+def reciprocal(*values):
+    return 1 / sum(1 / value for value in values)
+
+
+class ValueIndex:
+    """
+    Sorted unique values, queries return NaN where value is not found
+    """
+    def __init__(self, values: Iterable = ()):
+        values = u_array(values)
+        self.values = np.unique(values[~np.isnan(values)])
+        self.values.setflags(write=False)
+
+        self._pairs: Optional[Dict[str, tuple]] = None
+
+    @classmethod
+    def merge(cls, tables: Iterable[np.ndarray]) -> 'ValueIndex':
+        tables = list(tables)
+
+        return cls(np.concatenate(tables) if tables else np.empty(0))
+
+    def __len__(self):
+        return len(self.values)
+
+    def __contains__(self, value):
+        return bool(self.within(value, 0))
+
+    @property
+    def has_pairs(self) -> bool:
+        return 0 < len(self.values) <= PAIRS_VALUES
+
+    @property
+    def pairs(self) -> Dict[str, tuple]:
+        """
+        Sorted values of all pairs of values combined by `sum` and `reciprocal`
+        with indexes of the first and second value, computed on first use
+        """
+        if self._pairs is None:
+            if not self.has_pairs:
+                raise ValueError('Pairs are built for 1 to %d values, not %d' % (PAIRS_VALUES, len(self.values)))
+
+            first, second = np.triu_indices(len(self.values))
+            a, b = self.values[first], self.values[second]
+
+            self._pairs = {}
+            for operation, values in [('sum', a + b), ('reciprocal', a * b / (a + b))]:
+                order = np.argsort(values, kind='stable')
+                self._pairs[operation] = (values[order], first[order], second[order])
+
+        # Tables of least recently used indexes are dropped
+        paired[id(self)] = self
+        paired.move_to_end(id(self))
+        while len(paired) > PAIRS_INDEXES:
+            paired.popitem(last=False)[1]._pairs = None
+
+        return self._pairs
+
+    def lookup(self, indexes: np.ndarray) -> np.ndarray:
+        """
+        Values by indexes, NaN for indexes out of values
+        """
+        found = (indexes >= 0) & (indexes < len(self.values))
+        result = np.full(indexes.shape, np.nan)
+        result[found] = self.values[indexes[found]]
+
+        return result
+
+    def floor(self, targets):
+        """
+        The largest value that is less or equal to target
+        """
+        values = self.targets(targets)
+        indexes = np.searchsorted(self.values, values, side='right') - 1
+
+        return self.result(targets, self.lookup(indexes))
+
+    def ceil(self, targets):
+        """
+        The smallest value that is greater or equal to target
+        """
+        values = self.targets(targets)
+        indexes = np.searchsorted(self.values, values, side='left')
+
+        return self.result(targets, self.lookup(indexes))
+
+    def closest(self, targets):
+        """
+        The closest value to target, the lower one if both are the same far
+        """
+        values = self.targets(targets)
+        if not len(self.values):
+            return self.result(targets, np.full(values.shape, np.nan))
+
+        return self.result(targets, self.values[nearest(self.values, values)])
+
+    def within(self, targets, tolerance=0.1):
+        """
+        Is there value in `target * (1 ± tolerance)`
+        """
+        values = self.targets(targets)
+        margin = np.abs(values) * tolerance
+
+        start = np.searchsorted(self.values, values - margin, side='left')
+        end = np.searchsorted(self.values, values + margin, side='right')
+
+        return self.result(targets, end > start)
+
+    @staticmethod
+    def targets(targets) -> np.ndarray:
+        if isinstance(targets, (list, tuple, np.ndarray)):
+            return u_array(targets)
+
+        return u_array([targets])
+
+    @staticmethod
+    def result(targets, result: np.ndarray):
+        """
+        Scalar for one target, array for many
+        """
+        if isinstance(targets, (list, tuple, np.ndarray)):
+            return result
+
+        return result[0]
+
+
+def combination_value(tree: Tree) -> float:
+    if not isinstance(tree, tuple):
+        return tree
+
+    operation, items = tree
+    values = [combination_value(item) for item in items]
+
+    return sum(values) if operation == 'sum' else reciprocal(*values)
+
+
+def synthesize(index: ValueIndex, target, tolerance=0.01, parts=3) -> Optional[Tuple[float, Tree]]:
+    """
+    Combination of the minimal number of parts, up to 3, with value
+    in `target * (1 ± tolerance)`, the closest one of the same size.
+    Pairs of parts are taken from precomputed tables, the third part is
+    matched to the rest of target by `searchsorted`.
+    Only positive targets are synthesized, large indexes use single part.
+    """
+    target = u_array([target])[0]
+    if not len(index) or not np.isfinite(target) or target <= 0:
+        return None
+
+    if not index.has_pairs:
+        parts = 1
+
+    values = index.values
+
+    def error(value):
+        return np.abs(value - target) / abs(target)
+
+    closest = values[nearest(values, np.array([target]))[0]]
+    if error(closest) <= tolerance or parts < 2:
+        return (closest, closest) if error(closest) <= tolerance else None
+
+    # Two parts
+    candidates = []
+    for operation, (pairs, first, second) in index.pairs.items():
+        position = nearest(pairs, np.array([target]))[0]
+        candidates.append((error(pairs[position]), pairs[position],
+                           (operation, [values[first[position]], values[second[position]]])))
+
+    best = min(candidates, key=lambda candidate: candidate[0])
+    if best[0] <= tolerance or parts < 3:
+        return best[1:] if best[0] <= tolerance else None
+
+    # Three parts, rest of target for every value as the third part
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rests = {
+            'sum': target - values,
+            'reciprocal': 1 / (1 / target - 1 / values)
+        }
+
+    candidates = []
+    for operation, rest in rests.items():
+        is_possible = np.isfinite(rest) & (rest > 0)
+        if not is_possible.any():
+            continue
+
+        third = np.flatnonzero(is_possible)
+        rest = rest[is_possible]
+        for pair_operation, (pairs, first, second) in index.pairs.items():
+            positions = nearest(pairs, rest)
+            if operation == 'sum':
+                totals = values[third] + pairs[positions]
+            else:
+                totals = reciprocal(values[third], pairs[positions])
+
+            errors = error(totals)
+            best = errors.argmin()
+            position = positions[best]
+            pair = [values[first[position]], values[second[position]]]
+            if pair_operation == operation:
+                tree = (operation, [values[third[best]]] + pair)
+            else:
+                tree = (operation, [values[third[best]], (pair_operation, pair)])
+
+            candidates.append((errors[best], totals[best], tree))
+
+    if not candidates:
+        return None
+
+    best = min(candidates, key=lambda candidate: candidate[0])
+
+    return best[1:] if best[0] <= tolerance else None
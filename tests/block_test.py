@@ -1,6 +1,6 @@
 import os
 from bem import Block, bem_scope, u_V, u_Ohm
-from bem.model import Part, Param
+from bem.model import Part, Param, migrate
 from bem.utils.parser import block_description, block_params_description
 from bem.utils.args import get_arguments, get_params
 
@@ -135,6 +135,8 @@ def test_network():
 def test_resistor(value=100):
     from bem.basic import Resistor
 
+    migrate()
+
     part = Part(block='basic.Resistor',
         model='',
         library='Device',
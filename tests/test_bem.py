@@ -1,6 +1,6 @@
 import os
 from bem import Block, bem_scope, u_V, u_Ohm
-from bem.model import Part, Param
+from bem.model import Part, Param, migrate
 from bem.utils.parser import block_description, block_params_description
 from bem.utils.args import get_arguments, get_params
 
@@ -135,6 +135,8 @@ def test_network():
 def test_resistor(value=100):
     from bem.basic import Resistor
 
+    migrate()
+
     part = Part(block='basic.Resistor',
         model='',
         library='Device',
@@ -208,3 +210,850 @@ def test_resistor(value=100):
 
     dc & test_impeadance & next_impeadance & last_impeadance & dc
 
+
+
+def test_registry(tmp_path, monkeypatch):
+    from bem.registry import Registry
+
+    root = tmp_path / 'blocks'
+    mods = root / 'analog' / 'Divider' / '_type'
+    mods.mkdir(parents=True)
+    (root / 'analog' / 'Divider' / '__init__.py').write_text('')
+    (root / 'analog' / 'test.py').write_text('')
+    (mods / 'resistive.py').write_text('')
+    (mods / 'resistive_test.py').write_text('')
+    manifest = str(tmp_path / 'manifest.json')
+
+    blocks = Registry(str(root), manifest)
+    assert blocks.scope() == {'analog': {'Divider': {'type': ['resistive']}}}, 'Scope should contain Divider with type=resistive'
+    assert blocks.has_test('analog') and blocks.has_mod_test('analog.Divider', 'type', 'resistive'), 'Tests should be indexed'
+    assert os.path.exists(manifest), 'Manifest should be saved'
+
+    scanned = []
+    listing = Registry.listing
+    def listing_spy(self, path, cached):
+        entry, is_changed = listing(self, path, cached)
+        if is_changed:
+            scanned.append(path)
+
+        return entry, is_changed
+
+    monkeypatch.setattr(Registry, 'listing', listing_spy)
+
+    Registry(str(root), manifest)
+    assert scanned == [], 'Unchanged directories should be reused from manifest'
+
+    (mods / 'capacitive.py').write_text('')
+    blocks.refresh()
+    assert scanned == [os.path.join('analog', 'Divider', '_type')], 'Only changed directory should be scanned'
+    assert blocks.mod_file('analog.Divider', 'type', 'capacitive'), 'New modificator should be indexed'
+
+    monkeypatch.delenv('BEM_REGISTRY', raising=False)
+    monkeypatch.setenv('HOME', str(tmp_path / 'home'))
+    lookup = Registry(str(root))
+    assert not os.path.exists(tmp_path / 'home'), 'Manifest should not be saved without BEM_REGISTRY'
+
+    (mods / 'inductive.py').write_text('')
+    (root / 'analog' / 'Filter').mkdir()
+    (root / 'analog' / 'Filter' / '__init__.py').write_text('')
+    assert lookup.mod_file('analog.Divider', 'type', 'inductive'), 'Changed directory should be rescanned on lookup miss'
+    assert lookup.block('analog.Filter'), 'New block should be found on lookup miss'
+    assert lookup.block('analog.Unknown') is None, 'Missing block should not be found'
+
+
+def test_resolution_table(tmp_path, monkeypatch):
+    from bem.utils.structer import ResolutionTable, libraries
+
+    monkeypatch.setenv('BEM_REGISTRY', str(tmp_path / 'registry'))
+    first, second = str(tmp_path / 'first'), str(tmp_path / 'second')
+    for lib in [first, second]:
+        block = tmp_path / lib / 'demo' / 'Block'
+        (block / '_size').mkdir(parents=True)
+        (block / '__init__.py').write_text('')
+
+    (tmp_path / second / 'demo' / 'Block' / '_size' / 'big.py').write_text('')
+
+    monkeypatch.setenv('BEM_LIBRARIES', os.pathsep.join([first, second]))
+    assert libraries()[:2] == [first, second], 'Libraries should be read from BEM_LIBRARIES in order'
+
+    table = ResolutionTable([first, second])
+    assert table.block('demo.Block')[0] == first, 'Block from first library should take precedence'
+    assert table.mod('demo.Block', 'size', 'big')[0] == second, 'Modificator should be resolved from any library'
+    assert table.mod('demo.Block', 'size', 'small') is None, 'Unknown modificator should not be resolved'
+    assert (table.hits, table.misses) == (2, 1), 'Hits and misses should be counted'
+
+    (tmp_path / first / 'demo' / 'Block' / '_size' / 'small.py').write_text('')
+    table.invalidate()
+    assert table.mod('demo.Block', 'size', 'small')[0] == first, 'Invalidated table should see new modificator'
+
+
+def test_library_module(tmp_path, monkeypatch):
+    import sys
+    from importlib import import_module
+    from bem.utils.structer import bem_blocks_path, library_module
+
+    for index, parent in enumerate(['first', 'second']):
+        block = tmp_path / parent / 'blocks' / 'demo' / 'Block'
+        (block / '_size').mkdir(parents=True)
+        (block / '__init__.py').write_text('Base = %d\n' % index)
+        (block / '_size' / 'big.py').write_text('from .. import Base as Modificator\n')
+
+    path = list(sys.path)
+    first = library_module(str(tmp_path / 'first' / 'blocks'))
+    second = library_module(str(tmp_path / 'second' / 'blocks'))
+
+    assert first != second, 'Libraries with the same directory name should not shadow each other'
+    assert import_module(first + '.demo.Block').Base == 0 and import_module(second + '.demo.Block').Base == 1, 'Block should be imported from its library'
+    assert import_module(second + '.demo.Block._size.big').Modificator == 1, 'Relative imports in library should work'
+    assert sys.path == path, 'Libraries should be imported without sys.path changes'
+
+    monkeypatch.chdir(tmp_path / 'first' / 'blocks')
+    assert library_module(os.path.join('..', '..', 'second', 'blocks')) == second, 'Relative path should be resolved'
+    assert library_module(bem_blocks_path()) == 'bem.blocks', 'Bundled blocks should be imported from bem'
+
+    local = library_module('demo')
+    try:
+        assert local == 'demo' and import_module('demo.Block').Base == 0, 'Local library should keep its name'
+        monkeypatch.chdir(tmp_path / 'second' / 'blocks')
+        assert library_module('demo') not in ['demo', second], 'Library should not take name of other one'
+    finally:
+        for name in [name for name in sys.modules if name == 'demo' or name.startswith('demo.')]:
+            del sys.modules[name]
+
+
+def test_local_library():
+    from importlib import import_module
+    from bem import Build
+
+    Child = Build('example.Child').block
+
+    assert import_module('blocks.example.Child').Base in Child.__mro__, 'Local blocks should be the same classes as in composed block'
+    assert issubclass(Child, import_module('blocks.example.Base').Base), 'Local parent block should be in composed block'
+
+
+def test_catalog(tmp_path):
+    import peewee
+    from bem.model import connect, disconnect, db
+
+    database = str(tmp_path / 'catalog.db')
+    try:
+        connect(database)
+        migrate()
+        Param(name='value', value='1 2.2 4.7 / k M').save()
+        assert db.pragma('journal_mode') == 'wal', 'Read-write catalog should use WAL'
+
+        connect(database, mode='ro')
+        assert Param.select().count() == 1, 'Read-only catalog should be readable'
+        try:
+            Param(name='value', value='10').save()
+            assert False, 'Read-only catalog should not be writable'
+        except peewee.OperationalError:
+            pass
+
+        try:
+            connect(database, mode='readonly')
+            assert False, 'Unknown catalog mode should not be accepted'
+        except ValueError:
+            pass
+    finally:
+        disconnect()
+
+    assert db.obj is None, 'Catalog should be lazy after disconnect'
+
+
+def test_range_values():
+    from bem.utils.args import range_values
+
+    table = range_values('1 2.2 4.7 / k M')
+
+    assert list(table) == [1e3, 2.2e3, 4.7e3, 1e6, 2.2e6, 4.7e6], 'Range should be expanded by exponents and sorted'
+    assert table is range_values('1 2.2 4.7 / k M'), 'Range should be parsed once'
+    assert not table.flags.writeable, 'Shared table should be read-only'
+    assert list(range_values('4.7 1 / 0 3')) == [1, 4.7, 1e3, 4.7e3], 'Exponent could be power of 10'
+    assert list(range_values('220 100 1k')) == [100, 220, 1e3], 'Listed values should be sorted'
+
+
+def test_value_index():
+    import numpy as np
+    from bem.utils.args import range_values
+    from bem.utils.values import ValueIndex
+
+    index = ValueIndex.merge([range_values('1 2.2 4.7 / k'), range_values('2.2 10 / k')])
+
+    assert list(index.values) == [1e3, 2.2e3, 4.7e3, 1e4], 'Values should be sorted and unique'
+    assert index.closest(3000) == 2200 and index.closest(3 @ u_Ohm) == 1000, 'Closest value should be found'
+    assert list(index.closest([0, 1600, 4e6])) == [1e3, 1e3, 1e4], 'Equally far target should take lower value'
+    assert list(index.floor([999, 2200])[1:]) == [2200] and np.isnan(index.floor(999)), 'Floor should not be above target'
+    assert index.ceil(2201) == 4700 and np.isnan(index.ceil(2e4)), 'Ceil should not be below target'
+    assert list(index.within([2300, 2500], 0.05)) == [True, False], 'Tolerance should be checked for every target'
+    assert 4700 in index and 4701 not in index, 'Exact value should be found'
+    assert np.isnan(ValueIndex().closest(1)), 'Empty index should not find values'
+
+
+def test_synthesize():
+    from bem.utils.args import range_values
+    from bem.utils.values import ValueIndex, combination_value, synthesize
+
+    index = ValueIndex(range_values('1 1.2 1.5 1.8 2.2 2.7 3.3 3.9 4.7 5.6 6.8 8.2 / 0 1 2 3 4 5'))
+
+    assert synthesize(index, 3300) == (3300, 3300), 'Available value should be used as is'
+    assert synthesize(index, 5000, tolerance=0.001) == (5000, ('reciprocal', [10000, 10000])), 'Two parts should be combined'
+
+    value, tree = synthesize(index, 12345, tolerance=0.001)
+    assert tree[0] == 'sum' and len(tree[1]) == 3, 'Three parts should be combined if two are not enough'
+    assert abs(combination_value(tree) - 12345) <= 12.345 and value == combination_value(tree), 'Combination should be in tolerance'
+
+    assert synthesize(index, 1e8) is None, 'Target out of reach should not be synthesized'
+    assert synthesize(index, 5000, tolerance=0.001, parts=1) is None, 'Number of parts should be limited'
+    assert synthesize(index, 0) is None and synthesize(index, -5) is None, 'Only positive targets should be synthesized'
+
+    from bem.utils import values
+    large = ValueIndex(range(1, values.PAIRS_VALUES + 2))
+    assert synthesize(large, 1e6) is None and large._pairs is None, 'Pairs should not be built for large index'
+
+    indexes = [ValueIndex([1, 2, scale]) for scale in range(3, 4 + values.PAIRS_INDEXES)]
+    for small in indexes:
+        small.pairs
+    assert indexes[0]._pairs is None and indexes[-1]._pairs is not None, 'Pairs of least recently used indexes should be dropped'
+
+
+def test_combine():
+    from skidl import Net
+    from bem.blocks.abstract.Combination import Base as Combination
+
+    class Leaf(Combination):
+        def __init__(self, value):
+            self.value = value
+            self.input, self.output = Net('Input'), Net('Output')
+
+    resistor = Leaf(1000 @ u_Ohm)
+    input, output = Net('In'), Net('Out')
+    leaves = resistor.combine(('sum', [1000.0, ('reciprocal', [2200.0, 2200.0])]), input, output)
+
+    assert [float(leaf.value) for leaf in leaves] == [1000, 2200, 2200], 'Leaf blocks should have values of tree'
+    assert leaves[0].input.is_attached(input) and leaves[1].output.is_attached(output), 'Series items should be connected between nets'
+    assert leaves[0].output.is_attached(leaves[1].input) and leaves[1].input.is_attached(leaves[2].input), 'Parallel items should share nets'
+    assert not leaves[0].output.is_attached(output), 'Series items should be separated by inner net'
+
+
+def legacy_params(block):
+    from inspect import isroutine
+    from bem.utils.args import value_to_round
+
+    description = block_params_description(block)
+    black_list = ['name', '__module__'] + block.arguments + block.lazy_params
+    params = {}
+    for param in dir(block):
+        default = None if param.startswith('_') or param in black_list else getattr(block, param, None)
+        value = not isroutine(default) and value_to_round(default)
+        if value:
+            params[param] = value
+            if description.get(param, None):
+                params[param]['description'] = description[param]
+
+    return params
+
+
+def test_params_schema():
+    from bem import Build, Session
+    from bem.example import Base
+
+    with Session(inspect=False) as session:
+        instance = Base()(some_arg='VALUE')
+        instance.extra_param = 42
+        Electrical = Build('abstract.Electrical').block
+        electrical = Electrical()
+
+    schema = type(instance).params_schema
+    assert schema['some_param'] == {'kind': 'value', 'unit': 'number', 'description': 'param description parsed by BEM Block'}, 'Class param should be described once'
+    assert schema['some_arg']['kind'] == 'argument', 'Arguments should be in schema'
+    assert schema['notes']['kind'] == 'lazy' and 'classes' not in schema, 'Lazy params should be marked and structural attributes skipped'
+
+    assert get_params(instance) == legacy_params(instance), 'Params should be the same as from full lookup'
+    assert get_params(instance)['extra_param']['value'] == 42, 'Params assigned to instance should be found'
+    assert get_params(electrical) == legacy_params(electrical), 'Params should be the same as from full lookup'
+    assert type(electrical).params_schema is Electrical.params_schema, 'Schema should be shared by instances'
+
+    assert 'Z_load' not in get_params(electrical), 'Lazy Z_load should not be computed for params'
+    electrical.Z_load = 100 @ u_Ohm
+    assert get_params(electrical)['Z_load']['value'] == 100, 'Assigned Z_load should be exported'
+
+    session.dispose()
+
+
+def test_class_descriptions():
+    from bem import Build
+    from bem.example import Base
+
+    base = Base()
+    assert 'class_description' in vars(base) and 'params_description' in vars(base), 'Composed class should store descriptions'
+    assert block_description(base) == base.class_description, 'Description should be taken from composed class'
+
+    params_description = block_params_description(base)
+    params_description['some_param'] = 'changed'
+    assert base.params_description['some_param'] == 'param description parsed by BEM Block', 'Stored descriptions should not be changed by consumers'
+
+    Electrical = Build('abstract.Electrical').block
+    assert block_params_description(Electrical()) == Electrical.params_description, 'Instances should use descriptions of class'
+    assert Build('missing.Block').block.params_description == {}, 'Class without blocks should have no descriptions'
+
+
+def test_mount_plan():
+    from bem.utils.args import mount_plan
+
+    class Adder:
+        def willMount(self, V=0 @ u_V, items=[]):
+            V += 1 @ u_V
+            items.append(1)
+            self.V, self.items = V, items
+
+    Mounted = type('Mounted', (Block, Adder), {})
+    Mounted.classes = list(Mounted.__mro__)
+    Mounted.mount_plan = mount_plan(Mounted)
+
+    V, items = 5 @ u_V, []
+    instance = Mounted.__new__(Mounted)
+    Block.mount(instance, V=V, items=items)
+    assert instance.V == 6 @ u_V and V == 5 @ u_V and items == [], 'Arguments should be copied for willMount'
+
+    class Doubler:
+        def willMount(self, V=0 @ u_V):
+            self.V = V * 2
+
+    Inherited = type('Inherited', (Mounted, Doubler), {})
+    Inherited.classes = list(Inherited.__mro__)
+    instance = Inherited.__new__(Inherited)
+    Block.mount(instance, V=V)
+    assert 'mount_plan' in vars(Inherited) and instance.V == 10 @ u_V, 'Plan of parent class should not be reused'
+
+    class Keeper:
+        def willMount(self, name='', pins=(), value=0.0):
+            self.name, self.pins, self.value = name, pins, value
+
+    Kept = type('Kept', (Block, Keeper), {})
+    Kept.classes = list(Kept.__mro__)
+    Kept.mount_plan = mount_plan(Kept)
+    name, pins, value = 'Load', ('1', '2'), 1e3
+    instance = Kept.__new__(Kept)
+    Block.mount(instance, name=name, pins=pins, value=value)
+    assert instance.name is name and instance.pins is pins and instance.value is value, 'Immutable arguments should not be copied'
+
+
+def test_freeze_mods(tmp_path, monkeypatch):
+    from bem.utils.structer import (freeze_mods, get_mod_classes, invalidate_resolution,
+                                    sorted_mods, thaw_mods)
+
+    mods = {'size': ['small', 'big'], 'port': 'one'}
+    frozen = freeze_mods(mods)
+
+    assert frozen == (('size', ('small', 'big')), ('port', 'one')), 'Order of keys should be kept'
+    assert sorted_mods(mods) == sorted_mods({'port': 'one', 'size': ['small', 'big']}), 'Sorted mods should not depend on keys order'
+    assert frozen != freeze_mods({'size': ['big', 'small'], 'port': 'one'}), 'Order of values should be kept'
+    assert hash(frozen) and thaw_mods(frozen) == mods, 'Frozen mods should be hashable and restorable'
+
+    nested = {'map': {'a': [1, 2]}, 'set': {3}, 'object': [bytearray(b'1')]}
+    assert hash(freeze_mods(nested)) and thaw_mods(freeze_mods(nested)) == nested, 'Nested values should be restorable'
+    assert freeze_mods({'map': {'a': 1}}) != freeze_mods({'map': {'a': '1'}}), 'Different dict values should not collide'
+    assert freeze_mods({'object': bytearray(b'1')}) != freeze_mods({'object': bytearray(b'1')}), 'Unhashable values should be compared by identity'
+
+    block = tmp_path / 'lib' / 'demo' / 'Ordered'
+    for mod in ['a', 'b']:
+        (block / ('_' + mod)).mkdir(parents=True)
+        (block / ('_' + mod) / 'on.py').write_text('class Modificator:\n    pass\n')
+    (block / '__init__.py').write_text('')
+
+    monkeypatch.setenv('BEM_REGISTRY', str(tmp_path / 'registry'))
+    monkeypatch.setenv('BEM_LIBRARIES', str(tmp_path / 'lib'))
+    try:
+        invalidate_resolution()
+        files, classes, loaded = get_mod_classes('demo.Ordered', freeze_mods({'b': ['on'], 'a': ['on']}))
+        assert [os.path.basename(os.path.dirname(file)) for file in files] == ['_b', '_a'], 'Modificators should be loaded in order of request'
+    finally:
+        monkeypatch.undo()
+        invalidate_resolution()
+
+
+def test_source_cache(tmp_path, monkeypatch):
+    import importlib
+    from bem.utils.parser import source_lines, inspect_comments
+
+    module_file = tmp_path / 'source_example.py'
+    module_file.write_text('def circuit():\n    # Input resistor\n    r_in = 1\n    return r_in\n')
+    monkeypatch.syspath_prepend(str(tmp_path))
+    module = importlib.import_module('source_example')
+
+    source = source_lines(module.circuit.__code__)
+    assert source is source_lines(module.circuit.__code__), 'Source should be cached'
+    assert source.assignments == {'r_in': 2}, 'Assignments should be indexed'
+    assert inspect_comments(source, 2, 2) == ['Input resistor'], 'Comments should be indexed'
+
+    module_file.write_text('def circuit():\n    r_out = 1  # Output resistor\n    return r_out\n')
+    os.utime(module_file, ns=(0, 0))
+    assert source_lines(module.circuit.__code__).assignments == {'r_out': 1}, 'Changed source should be reread'
+
+    from bem.utils import parser
+    monkeypatch.setattr(parser, 'SOURCES_SIZE', 1)
+    source_lines(module.circuit.__code__)
+    source_lines(source_lines.__code__)
+    assert len(parser.sources) == 1, 'Sources cache should be bounded'
+
+
+def test_inner_refs():
+    from bem import Build
+
+    Electrical = Build('abstract.Electrical').block
+
+    class Divider(Electrical):
+        def circuit(self):
+            # Upper arm of divider
+            top_arm = Electrical()
+            bottom = Electrical()
+
+    divider = Divider()
+    top_arm, bottom = [block for owner, block in Block.scope if owner is divider]
+
+    assert len(divider.build_frames) == 1, 'Circuit frame should be captured'
+    assert top_arm.notes == ['Upper arm of divider'], 'Inner block should get notes from circuit'
+    # Ref could be prefixed and shortened by owner ref
+    assert 'To' in top_arm.ref, 'Inner block should get ref from circuit variable'
+    assert 'Bo' in bottom.ref, 'Inner block should get ref from circuit variable'
+
+
+def test_lazy_notes(monkeypatch):
+    from bem import Build
+    from bem.abstract import Network
+    from bem.utils import parser
+
+    Electrical = Build('abstract.Electrical').block
+
+    class Divider(Electrical):
+        def circuit(self):
+            # Lower arm of divider
+            bottom_arm = Electrical()
+
+    def parse_comments(*args):
+        raise AssertionError('Comments should not be parsed in build')
+
+    with monkeypatch.context() as patch:
+        patch.setattr(parser, 'inspect_comments', parse_comments)
+
+        # Divider note
+        divider = Divider()
+        one = Network(port='one')()
+        second = Network(port='one')()
+        # Link note
+        one & second
+
+    bottom_arm = [block for owner, block in Block.scope if owner is divider][0]
+
+    assert all(isinstance(note, parser.NoteRef) for note in divider._notes), 'Notes should be stored as references'
+    assert divider.notes == ['Divider note'], 'Block notes should be resolved on access'
+    assert bottom_arm.notes == ['Lower arm of divider'], 'Inner block notes should be resolved on access'
+    assert parser.resolve_notes(one.output.notes) == ['Link note'], 'Pin notes should be resolved on export'
+
+    from bem.utils import uniq_f7
+    note = divider._notes[0]
+    assert note == 'Divider note' and hash(note) == hash('Divider note'), 'Notes should be equal and hashed as text'
+    assert uniq_f7([note, 'Divider note', note]) == ['Divider note'], 'Notes should be deduplicated with text'
+    assert len(parser.uniq_notes([note, 'Divider note', note])) == 2, 'References should be deduplicated by position'
+
+
+def test_scope():
+    from bem.scope import Scope
+    from bem.utils.structer import hierarchy
+
+    class Item:
+        def __init__(self, ref):
+            self.ref = ref
+
+    class Node(Item):
+        pass
+
+    root, first, second = Item('_'), Node('First'), Item('Second')
+    scope = Scope([(None, root), (root, first), (first, second)])
+
+    assert scope.is_member(first) and not scope.is_member(Node('First')), 'Membership should be by identity'
+    assert scope.children_of(root) == [first], 'Children should be indexed by owner'
+    assert scope.blocks_of_type(Item) == [root, first, second], 'Blocks of type should keep creation order'
+    assert scope.blocks_of_type(Node) == [first], 'Blocks should be bucketed by type'
+
+    holder = type('Holder', (), {'scope': scope})
+    assert hierarchy(holder) == {'_': {'First': {'Second': {}}}}, 'Hierarchy should be built from scope'
+
+    third = Node('Third')
+    scope.insert(1, (root, third))
+    assert scope.blocks_of_type(Node) == [third, first], 'Inserted block should be indexed in position'
+    scope.remove((root, first))
+    assert not scope.is_member(first) and scope.children_of(root) == [third], 'Removed block should be dropped from indexes'
+    del scope[-1]
+    scope += [(third, second)]
+    assert scope.children_of(third) == [second] and scope.children_of(first) == [], 'Changed items should be indexed'
+    scope[0] = (None, first)
+    assert scope.is_member(first) and not scope.is_member(root) and scope.pop() == (third, second), 'Replaced item should be indexed'
+    assert not scope.is_member(second), 'Popped block should be dropped from indexes'
+
+    from bem.scope import Refs
+    refs = Refs(['R', 'R_1'])
+    refs.remove('R_1')
+    assert 'R_1' not in refs and refs.allocate('R') == 'R_1', 'Removed ref should be free'
+
+
+def test_spice_flag():
+    import builtins
+    from bem import Session
+    from bem.scope import Scope
+    from bem.session import Flag
+    from bem.simulator import set_spice_enviroment
+
+    NC = getattr(builtins, 'NC', None)
+    try:
+        with Session() as session:
+            builtins.SIMULATION = False
+            set_spice_enviroment()
+
+            assert isinstance(builtins.SIMULATION, Flag) and SIMULATION, 'Assigned builtin should be replaced by session flag'
+
+            scope = Scope()
+            Block.__new__(Block).scope = scope
+            assert session.scope is scope, 'Session attribute should be assigned to current session'
+
+        assert not SIMULATION, 'Default session should keep assigned flag'
+    finally:
+        builtins.NC = NC
+
+    session.dispose()
+
+
+def test_sessions_concurrent():
+    from concurrent.futures import ThreadPoolExecutor
+    from bem import Build, Session
+
+    Electrical = Build('abstract.Electrical').block
+
+    class Divider(Electrical):
+        def circuit(self):
+            top_arm = Electrical()
+            bottom = Electrical()
+
+    def design(index):
+        with Session(debug=False) as session:
+            created = [Divider() for _ in range(5)] + [Electrical() for _ in range(index % 3)]
+
+            return session, created, [block.ref for block in created]
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        designs = list(executor.map(design, range(48)))
+
+    for index, (session, created, refs) in enumerate(designs):
+        blocks = [block for owner, block in session.scope]
+        inner = [block for owner, block in session.scope if owner in created]
+
+        assert len(blocks) == 15 + index % 3, 'Session scope should contain only blocks of own design'
+        assert all(session.scope.is_member(block) for block in created), 'Created blocks should be in own scope'
+        assert len(inner) == 10, 'Inner blocks should be owned by blocks of own design'
+        assert len(set(session.refs)) == len(session.refs), 'Refs should be unique in session'
+        assert refs[:2] == ['E', 'E_1'], 'Refs should be allocated independently of other sessions'
+        assert session.owner == [None], 'All blocks should be released'
+        assert all(block.input.circuit is session.circuit for block in blocks), 'Nets should be created in session circuit'
+
+
+def test_identity():
+    import subprocess
+    import sys
+    from bem import Build, Session
+
+    Electrical = Build('abstract.Electrical').block
+
+    class Divider(Electrical):
+        def circuit(self):
+            top_arm = Electrical()
+            bottom = Electrical()
+
+    def design():
+        with Session(debug=False) as session:
+            Divider()
+            Divider()
+
+        return [block for owner, block in session.scope]
+
+    first, second = design(), design()
+    identities = [block.identity for block in first]
+
+    assert identities == [block.identity for block in second], 'Identity should be the same for the same design'
+    assert len(set(identities)) == len(identities), 'Identity should be unique in design'
+    assert str(first[0]) is str(first[0]), 'Pretty name should be computed once'
+
+    from bem.example import Base
+
+    def siblings(debug):
+        with Session(debug=debug) as session:
+            blocks = [Base()(some_arg=1), Base()(some_arg=1)]
+
+        session.dispose()
+
+        return [block.identity for block in blocks]
+
+    assert len(set(siblings(False))) == 2, 'Siblings without ref should have different identity'
+    assert siblings(True) == siblings(False), 'Identity should not depend on logging'
+
+    code = '\n'.join(['from bem import Build, Session',
+                      'with Session(debug=False, inspect=False):',
+                      '    print(Build("abstract.Electrical").block(ref="LOAD").identity)'])
+    env = {**os.environ, 'PYTHONPATH': os.path.dirname(os.path.dirname(os.path.abspath(__file__)))}
+    result = subprocess.run([sys.executable, '-c', code], env=env, capture_output=True, text=True)
+
+    with Session(debug=False, inspect=False):
+        load = Build('abstract.Electrical').block(ref='LOAD')
+
+    assert result.stdout.strip().split('\n')[-1] == load.identity, 'Identity should be stable across runs'
+
+
+def test_explicit_ref():
+    from bem import Build, Session
+
+    Electrical = Build('abstract.Electrical').block
+
+    with Session(inspect=False) as session:
+        block = Electrical(ref='LOAD', notes=['Explicit note'], V=5 @ u_V)
+
+        class Owner:
+            V = 12 @ u_V
+
+        session.owner.append(Owner())
+        inner = Electrical(ref='INNER')
+        unset = Electrical(V=None)
+        session.owner.pop()
+
+    assert block.ref == 'LOAD' and block.notes == ['Explicit note'], 'Explicit ref and notes should be used'
+    assert block.V == 5 @ u_V, 'Explicit V should be used'
+    assert inner.ref == 'INNER' and inner.V == 12 @ u_V, 'V should be taken from owner block'
+    assert unset.V == 12 @ u_V, 'Unset V should be taken from owner block'
+
+    session.dispose()
+
+
+def test_inspect_disabled(tmp_path):
+    import subprocess
+    import sys
+    from pathlib import Path
+
+    script = '\n'.join([
+        'from bem import Build, u_V',
+        'from bem.session import current_session',
+        'class Owner:',
+        '    V = 12 @ u_V',
+        'current_session().owner.append(Owner())',
+        'print(float(Build("abstract.Electrical").block(V=None).V))'
+    ])
+    env = {**os.environ, 'PYTHONPATH': str(Path(__file__).parent.parent), 'BEM_INSPECT': '0'}
+    result = subprocess.run([sys.executable, '-c', script], cwd=tmp_path, env=env, capture_output=True, text=True)
+    assert result.returncode == 0, result.stderr
+
+    assert result.stdout.strip().split('\n')[-1] == '12.0', 'Unset V should be taken from owner block'
+
+
+def test_refs():
+    from bem.scope import Refs
+    from bem.utils.parser import code_ref, inner_ref
+
+    refs = Refs(['R', 'R_2'])
+
+    assert [refs.allocate('R') for _ in range(3)] == ['R_1', 'R_3', 'R_4'], 'Lowest free index should be allocated'
+    assert refs.allocate('C') == 'C' and 'C' in refs, 'Free ref should be used as is'
+
+    assert code_ref('input_resistor = Resistor()(value=100)', 'Resistor', '', None) == 'IR', 'Ref should be taken from variable'
+    assert len(code_ref('very_long_variable_name = Resistor()', 'Resistor', 'Load', 'Divider')) <= 7, 'Ref should be shortened'
+    assert inner_ref('Divider', 'top_arm') == ('DiToAr', 'Di'), 'Inner ref should be shortened to 6 chars'
+
+
+def test_disposed_sessions():
+    import gc
+    from bem import Build, Session
+
+    Electrical = Build('abstract.Electrical').block
+
+    class Divider(Electrical):
+        def circuit(self):
+            top_arm = Electrical()
+            bottom = Electrical()
+
+    def alive():
+        gc.collect()
+
+        return len([item for item in gc.get_objects() if isinstance(item, Block)])
+
+    # Long living session of build service
+    with Session(debug=False) as session:
+        def build(times):
+            for _ in range(times):
+                Divider()
+                session.dispose()
+
+        build(10)
+        before = alive()
+        build(200)
+        after = alive()
+
+    assert after <= before, 'Disposed builds should not keep blocks'
+
+
+def test_logger_init(tmp_path, monkeypatch):
+    import logging
+    import pytest
+    from bem.utils.logger import logger_init, queues
+
+    filename = str(tmp_path / 'test.log')
+    log = logger_init('bem.test', filename)
+    log = logger_init('bem.test', filename)
+    log.info('Message %d', 1)
+
+    # Wait for records written by listener thread
+    handler, listener = queues[filename]
+    listener.stop()
+    listener.start()
+
+    assert log.handlers == [handler], 'Logger should have one handler'
+    assert open(filename).read().count('Message 1') == 1, 'Record should be written once'
+
+    monkeypatch.setenv('BEM_LOG_LEVEL', 'verbose')
+    with pytest.warns(UserWarning):
+        log = logger_init('bem.test_level', filename)
+    assert log.level == logging.INFO, 'Unknown level should fall back to INFO'
+
+    monkeypatch.setenv('BEM_LOG_LEVEL', 'debug')
+    assert logger_init('bem.test_level', filename).level == logging.DEBUG, 'Level should be taken from environment'
+
+
+def test_block_namespace(tmp_path):
+    import importlib
+    import sys
+    from bem.namespace import BlockScopeFinder
+
+    block_dir = tmp_path / 'lazy' / 'Block'
+    (block_dir / '_size').mkdir(parents=True)
+    (block_dir / '__init__.py').touch()
+    (block_dir / '_size' / 'small.py').touch()
+
+    finder = BlockScopeFinder('bem', [str(tmp_path)])
+    sys.meta_path.append(finder)
+    try:
+        module = importlib.import_module('bem.lazy')
+        assert callable(module.Block), 'Block builder should be resolved'
+        assert 'Block' in bem_scope(str(tmp_path))['lazy'], 'Lazy namespace should match scope walk'
+    finally:
+        sys.meta_path.remove(finder)
+        sys.modules.pop('bem.lazy', None)
+
+
+def test_import_time(tmp_path):
+    import subprocess
+    import sys
+    from pathlib import Path
+
+    # skidl is imported first, so bem time is its own startup on top of skidl
+    env = {**os.environ, 'PYTHONPATH': str(Path(__file__).parent.parent)}
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import skidl; import sys, bem; print(" ".join(sys.modules))'],
+                            cwd=tmp_path, env=env, capture_output=True, text=True)
+    assert result.returncode == 0, result.stderr
+
+    cumulative = {}
+    for line in result.stderr.split('\n'):
+        if not line.startswith('import time:') or line.find('cumulative') != -1:
+            continue
+
+        _, time, module = line[len('import time:'):].split('|')
+        cumulative[module.strip()] = int(time)
+
+    budget = float(os.getenv('BEM_IMPORT_BUDGET', 1.0))
+    assert cumulative['bem'] <= cumulative['skidl'] * budget, 'Import of bem should take less than %.1f of skidl import' % budget
+
+    imported = result.stdout.split()
+    for module in ['IPython', 'lcapy', 'sympy']:
+        assert module not in imported, '%s should be imported only when needed' % module
+
+
+def test_block_class_cache():
+    from bem import Build
+
+    assert Build('example.Base').block is Build('example.Base').block, 'Composed class should be reused'
+    assert Build('example.Base').block is not Build('example.Base', some_prop='VALUE').block, 'Props should be part of signature'
+    assert Build('example.Complex', size=['small', 'big']).block is Build('example.Complex', size=['small', 'big']).block, 'Class with mods should be reused'
+
+
+def test_spice_lookup():
+    from bem.builder import Build, spice_index
+
+    parts = list({id(part): part for part in spice_index().values()}.values())
+
+    def lookup(name):
+        for part in parts:
+            if name == part.name or (hasattr(part, 'aliases') and name in part.aliases):
+                return part
+
+    for name in ['R', 'C', 'V', 'I']:
+        assert Build(name).spice is lookup(name), 'Indexed lookup should match linear scan'
+
+
+def test_spice_index_tool():
+    from skidl import KICAD, get_default_tool, set_default_tool
+    from bem.builder import Build, spice_index
+
+    tool = get_default_tool()
+    set_default_tool(KICAD)
+    try:
+        spice_index.cache_clear()
+        assert Build('R').spice is not None, 'SPICE part should be found'
+        assert get_default_tool() == KICAD, 'Default tool should not be changed by SPICE lookup'
+    finally:
+        set_default_tool(tool)
+
+
+def test_inspected_notes():
+    from bem import Build, Session
+
+    Base = Build('example.Base').block
+
+    with Session(inspect=True) as session:
+        # Here is a comment for block
+        inspected = Base()
+
+    session.dispose()
+
+    with Session(inspect=False) as session:
+        # Here is a comment for block
+        explicit = Base()
+
+    assert inspected.notes == ['Here is a comment for block'], 'Notes should be grabbed from source'
+    assert explicit.notes == [], 'Source should not be inspected'
+
+    session.dispose()
+
+
+def test_unit_conversion():
+    import numpy as np
+    from PySpice.Unit import u_kOhm
+    from bem import u, u_array
+
+    units = {
+        'units': [(index + 1) @ u_kOhm for index in range(10)],
+        'strings': [str(index + 1) + 'k' for index in range(10)],
+        'floats': [index + 0.5 for index in range(10)],
+        'waveform': u_V(np.linspace(0, 5, 10))
+    }
+
+    for kind, values in units.items():
+        assert np.array_equal(u_array(values), [u(value) for value in values]), 'Batch conversion of %s should match u' % kind
+
+    assert u_array(['1.5m', 'abc'], default=np.nan)[1] != u_array(['abc'])[0], 'Not numbers should be default'
+
+
+def test_is_tolerated():
+    from PySpice.Unit import u_kOhm
+    from bem import is_tolerated
+
+    E24 = '1 1.1 1.2 1.3 1.5 1.6 1.8 2 2.2 2.4 2.7 3 3.3 3.6 3.9 4.3 4.7 5.1 5.6 6.2 6.8 7.5 8.2 9.1'
+
+    assert is_tolerated(4.7 @ u_kOhm, E24 + ' / k M'), 'Value from range should be tolerated'
+    assert not is_tolerated(4.7 @ u_kOhm, E24 + ' / m M'), 'Value out of range should not be tolerated'
+    assert is_tolerated([3 @ u_kOhm, '4.7k'], E24 + ' / k'), 'List should be tolerated by any of its values in range'
+    assert not is_tolerated([3.5 @ u_kOhm, '4.8k'], E24 + ' / k'), 'List without values in range should not be tolerated'
@@ -0,0 +1,461 @@
+import importlib
+import os
+import sys
+import tempfile
+from time import perf_counter
+
+import pytest
+
+from bem import bem_scope
+from bem.namespace import BlockScopeFinder
+
+# Timings depend on machine load, benchmarks are run on demand: cd tests && BEM_BENCHMARK=1 pytest test_benchmark.py
+pytestmark = pytest.mark.skipif(not os.getenv('BEM_BENCHMARK'), reason='BEM_BENCHMARK is not set')
+
+
+def measure(func, repeat=5):
+    best = None
+    for _ in range(repeat):
+        start = perf_counter()
+        func()
+        elapsed = perf_counter() - start
+        if best is None or best > elapsed:
+            best = elapsed
+
+    return best
+
+
+def make_library(root, scope, blocks, mods=2):
+    for index in range(blocks):
+        block_dir = os.path.join(root, scope, 'Block%d' % index)
+        os.makedirs(os.path.join(block_dir, '_size'))
+        open(os.path.join(block_dir, '__init__.py'), 'w').close()
+        for mod in range(mods):
+            open(os.path.join(block_dir, '_size', 'mod%d.py' % mod), 'w').close()
+
+
+def test_benchmark_lazy_namespace():
+    timings = {}
+
+    for size in [10, 500]:
+        with tempfile.TemporaryDirectory() as root:
+            scope = 'bench%d' % size
+            make_library(root, scope, size)
+
+            finder = BlockScopeFinder('bem', [root])
+            sys.meta_path.append(finder)
+
+            def resolve():
+                sys.modules.pop('bem.' + scope, None)
+                module = importlib.import_module('bem.' + scope)
+                assert callable(module.Block0), 'Block builder should be resolved'
+
+            try:
+                timings[size] = {
+                    'lazy': measure(resolve),
+                    'eager': measure(lambda: bem_scope(root))
+                }
+            finally:
+                sys.meta_path.remove(finder)
+                sys.modules.pop('bem.' + scope, None)
+
+    assert timings[500]['lazy'] < timings[10]['lazy'] * 5 + 0.001, 'Lazy resolve should not depend on library size'
+    assert timings[500]['lazy'] < timings[500]['eager'], 'Lazy resolve should be faster than eager scope walk'
+
+
+def test_benchmark_block_class_cache():
+    from bem import Build
+    from bem.builder import invalidate_blocks
+
+    def build(times=200):
+        for _ in range(times):
+            Build('example.Complex', size=['small', 'big']).block
+
+    def build_uncached():
+        for _ in range(200):
+            invalidate_blocks()
+            Build('example.Complex', size=['small', 'big']).block
+
+    cached = measure(build, 3)
+    uncached = measure(build_uncached, 3)
+
+    assert cached < uncached, 'Cached builds should be faster'
+
+
+def test_benchmark_mount_plan(monkeypatch):
+    import builtins
+    from inspect import getargspec
+    from bem import Block
+    from bem.utils.args import mount_plan
+
+    def modificator(index):
+        def willMount(self, value=0, items=[], **kwargs):
+            self.value = value
+
+        return type('Modificator%d' % index, (), {'willMount': willMount})
+
+    Deep = type('Deep', (Block,) + tuple(modificator(index) for index in range(30)), {})
+    Deep.classes = list(reversed(Deep.__mro__))
+
+    def mount_legacy(self, *args, **kwargs):
+        for cls in [cls for cls in self.classes[:-1] if 'builder' not in str(cls)]:
+            if hasattr(cls, 'willMount'):
+                mount_args_keys = getargspec(cls.willMount).args
+                if len(mount_args_keys) == 1:
+                    args = []
+
+                mount_args = {key: value.copy() if hasattr(value, 'copy') else value for key, value in kwargs.copy().items()
+                              if key in mount_args_keys}
+                cls.willMount(self, *args, **mount_args)
+
+    instance = Deep.__new__(Deep)
+    monkeypatch.setattr(builtins, 'DEBUG', False)
+    kwargs = {'value': 10, 'items': [1, 2, 3], 'unused': {'a': 1}}
+
+    Deep.mount_plan = mount_plan(Deep)
+    planned = measure(lambda: [Block.mount(instance, **kwargs) for _ in range(200)], 3) / 200
+    legacy = measure(lambda: [mount_legacy(instance, **kwargs) for _ in range(200)], 3) / 200
+
+    assert instance.value == 10, 'willMount should be called with passed arguments'
+    assert planned < legacy, 'Mount plan should be faster than introspection on every mount'
+
+
+def test_benchmark_spice_lookup():
+    from bem.builder import Build, spice_index
+
+    index = spice_index()
+    parts = list({id(part): part for part in index.values()}.values())
+
+    def lookup_legacy(name):
+        for part in parts:
+            if name == part.name or (hasattr(part, 'aliases') and name in part.aliases):
+                return part
+
+    names = ['R', 'C', 'V', 'I'] * 50
+    indexed = measure(lambda: [Build(name).spice for name in names], 3)
+    legacy = measure(lambda: [lookup_legacy(name) for name in names], 3)
+
+    assert indexed < legacy, 'Indexed lookup should be faster than linear scan'
+
+
+def test_benchmark_explicit_ref(monkeypatch):
+    import builtins
+    from bem import Block, Build
+
+    monkeypatch.setattr(builtins, 'DEBUG', False)
+    Base = Build('example.Base').block
+
+    def build(times=200):
+        for _ in range(times):
+            # Here is a comment for block
+            block = Base()
+            block.release()
+
+        return block
+
+    monkeypatch.setattr(builtins, 'INSPECT', True)
+    inspected = measure(build, 3)
+
+    monkeypatch.setattr(builtins, 'INSPECT', False)
+    explicit = measure(build, 3)
+
+    assert explicit < inspected, 'Skipping frames inspection should be faster'
+
+
+def test_benchmark_source_cache(monkeypatch):
+    import builtins
+    from bem import Build
+    from bem.utils import parser
+
+    monkeypatch.setattr(builtins, 'DEBUG', False)
+    monkeypatch.setattr(builtins, 'INSPECT', True)
+    Base = Build('example.Base').block
+
+    def build(times=100):
+        for _ in range(times):
+            block = Base()
+            block.release()
+
+    def build_uncached(times=100):
+        for _ in range(times):
+            parser.sources.clear()
+            block = Base()
+            block.release()
+
+    cached = measure(build, 3)
+    uncached = measure(build_uncached, 3)
+
+    assert cached < uncached, 'Cached source should be faster than reading it for every block'
+
+
+def test_benchmark_circuit_capture():
+    from bem.utils.frames import capture_frames
+
+    def work(value):
+        return value + 1
+
+    class Circuit:
+        def circuit(self):
+            # Calls inside of circuit, like skidl and units
+            total = 0
+            for value in range(20000):
+                total = work(total) + len(str(value))
+
+            return total
+
+    block = Circuit()
+
+    def capture():
+        with capture_frames(block):
+            block.circuit()
+
+    def capture_legacy():
+        frames = []
+
+        def tracer(frame, event, arg):
+            if event == 'return' and frame.f_code.co_name == 'circuit':
+                frames.append(frame)
+
+        sys.setprofile(tracer)
+        try:
+            block.circuit()
+        finally:
+            sys.setprofile(None)
+
+    captured = measure(capture, 3)
+    legacy = measure(capture_legacy, 3)
+
+    assert captured < legacy, 'Frames capture should be cheaper than profile hook'
+
+
+def test_benchmark_scope_index():
+    from bem.scope import Scope
+
+    class Item:
+        pass
+
+    pairs = [(None, Item()) for _ in range(5000)]
+    scope = Scope(pairs)
+    last = pairs[-1][1]
+
+    indexed = measure(lambda: [scope.is_member(last) for _ in range(100)], 3)
+    scanned = measure(lambda: [True in [item[1] == last for item in pairs] for _ in range(100)], 3)
+
+    assert indexed < scanned, 'Indexed membership should be faster than scope scan'
+
+
+def test_benchmark_refs_allocation():
+    from bem.scope import Refs
+
+    def allocate(times=300):
+        refs = Refs()
+        for _ in range(times):
+            refs.allocate('R')
+
+        return refs
+
+    def allocate_legacy(times=300):
+        refs = []
+        for _ in range(times):
+            ref = 'R'
+            index = 1
+            while ref in refs:
+                ref = 'R_' + str(index)
+                index += 1
+            refs.append(ref)
+
+        return refs
+
+    assert list(allocate(100)) == allocate_legacy(100), 'Allocated refs should be the same as with scan'
+
+    allocated = measure(allocate, 1)
+    legacy = measure(allocate_legacy, 1)
+
+    assert allocated * 10 < legacy, 'Ref allocation should not scan used refs'
+
+
+def test_benchmark_logging():
+    from bem import Build, Session
+
+    Electrical = Build('abstract.Electrical').block
+
+    def build(debug, times=50):
+        with Session(debug=debug, inspect=False) as session:
+            for _ in range(times):
+                Electrical()
+
+        session.dispose()
+
+    enabled = measure(lambda: build(True), 3)
+    disabled = measure(lambda: build(False), 3)
+
+    assert disabled < enabled, 'Disabled logging should not build messages'
+
+
+def test_benchmark_unit_conversion():
+    import numpy as np
+    from PySpice.Unit import u_kOhm, u_V
+    from bem import u, u_array
+
+    units = {
+        'units': [(index + 1) @ u_kOhm for index in range(5000)],
+        'strings': [str(index + 1) + 'k' for index in range(5000)],
+        'floats': [index + 0.5 for index in range(5000)],
+        'waveform': u_V(np.linspace(0, 5, 5000))
+    }
+
+    timings = {}
+    for kind, values in units.items():
+        assert np.array_equal(u_array(values), [u(value) for value in values]), 'Batch conversion should match u'
+
+        timings[kind] = {
+            'batch': measure(lambda: u_array(values), 3),
+            'single': measure(lambda: [u(value) for value in values], 3)
+        }
+
+    for kind, timing in timings.items():
+        assert timing['batch'] < timing['single'], 'Batch conversion of %s should be faster' % kind
+
+
+def test_benchmark_range_values():
+    import numpy as np
+    from PySpice.Unit import u_kOhm
+    from bem import is_tolerated
+    from bem.utils.args import _prefix
+
+    E24 = '1 1.1 1.2 1.3 1.5 1.6 1.8 2 2.2 2.4 2.7 3 3.3 3.6 3.9 4.3 4.7 5.1 5.6 6.2 6.8 7.5 8.2 9.1'
+    catalog = [E24 + ' / ' + exp for exp in ['m', 'k', 'M', 'k M', 'm k M']] * 60
+    desire = 4.7 @ u_kOhm
+
+    def check():
+        return [is_tolerated(desire, values) for values in catalog]
+
+    def check_legacy():
+        result = []
+        for values in catalog:
+            scales, exponenta = values.split('/')
+            table = []
+            for exp in exponenta.strip().split(' '):
+                scale = np.array(scales.strip().split(' ')).astype(float)
+                table += list(scale * _prefix[exp])
+
+            result.append(float(desire) in [float(value) for value in table])
+
+        return result
+
+    assert check() == check_legacy(), 'Cached ranges should give the same result'
+
+    cached = measure(check, 3)
+    legacy = measure(check_legacy, 3)
+
+    assert cached < legacy, 'Cached ranges should be faster than parsing on every check'
+
+
+def test_benchmark_value_index():
+    import numpy as np
+    from bem import u
+    from bem.utils.args import range_values
+    from bem.utils.values import ValueIndex
+
+    E96 = ' '.join('%.2f' % round(10 ** (index / 96), 2) for index in range(96))
+    values = list(range_values(E96 + ' / 0 1 2 3 4 5'))
+    targets = list(np.random.RandomState(0).uniform(1, 1e6, 200))
+
+    def closest_legacy(value):
+        closest = None
+        for unit in values:
+            if not closest:
+                closest = unit
+
+            if abs(u(value) - u(closest)) > abs(u(value) - u(unit)):
+                closest = unit
+
+        return closest
+
+    index = ValueIndex(values)
+    assert list(index.closest(targets)) == [closest_legacy(target) for target in targets], 'Index should find the same values'
+
+    batch = measure(lambda: index.closest(targets), 3)
+    single = measure(lambda: [index.closest(target) for target in targets], 3)
+    legacy = measure(lambda: [closest_legacy(target) for target in targets], 1)
+
+    assert batch < single < legacy, 'Batch query should be faster than one by one and linear scan'
+
+
+def test_benchmark_synthesis():
+    import numpy as np
+    from bem.utils.args import range_values
+    from bem.utils.values import ValueIndex, combination_value, synthesize
+
+    E96 = ' '.join('%.2f' % round(10 ** (index / 96), 2) for index in range(96))
+    index = ValueIndex(range_values(E96 + ' / 0 1 2 3 4 5'))
+    targets = np.random.RandomState(0).uniform(10, 1e6, 50)
+    tolerance = 1e-4
+
+    def parts(tree):
+        return sum(parts(item) for item in tree[1]) if isinstance(tree, tuple) else 1
+
+    def pairs_legacy(target):
+        values = index.values
+        a, b = np.meshgrid(values, values)
+        totals = np.concatenate([(a + b).ravel(), (a * b / (a + b)).ravel()])
+
+        return np.abs(totals - target).min() / target <= tolerance
+
+    # Tables are computed once for index
+    index.pairs
+    results = [synthesize(index, target, tolerance) for target in targets]
+    for target, result in zip(targets, results):
+        assert result is not None, 'E96 combination of three parts should be found'
+        assert abs(combination_value(result[1]) - target) <= target * tolerance, 'Combination should be in tolerance'
+
+        assert parts(result[1]) < 3 or not pairs_legacy(target), 'Two parts should be used when they are enough'
+
+    synthesized = measure(lambda: [synthesize(index, target, tolerance) for target in targets], 3)
+    legacy = measure(lambda: [pairs_legacy(target) for target in targets], 1)
+
+    assert synthesized < legacy, 'Three parts synthesis should be faster than search of pairs without tables'
+
+
+def test_benchmark_params_schema():
+    from bem import Build, Session
+    from bem.utils.args import get_params
+    from tests.test_bem import legacy_params
+
+    with Session(inspect=False) as session:
+        blocks = [Build('abstract.Electrical').block() for _ in range(20)]
+
+    assert all(get_params(block) == legacy_params(block) for block in blocks), 'Params should be the same'
+
+    schema = measure(lambda: [get_params(block) for block in blocks], 3)
+    legacy = measure(lambda: [legacy_params(block) for block in blocks], 3)
+
+    assert schema * 2 < legacy, 'Params should be read by class schema'
+
+    session.dispose()
+
+
+def test_benchmark_class_descriptions():
+    from bem import Build
+    from bem.utils.parser import block_params_description
+
+    Electrical = Build('abstract.Electrical').block
+
+    def legacy_description(block):
+        params = {}
+        for cls in block.classes[:-1]:
+            doc = ''.join(getattr(cls, method).__doc__ or '' for method in block.doc_methods
+                          if hasattr(cls, method))
+            for line in doc.split('\n'):
+                if len(line.strip()):
+                    term, description = line.strip().split(' -- ')
+                    params[term.strip()] = description.strip()
+
+        return params
+
+    assert block_params_description(Electrical) == legacy_description(Electrical), 'Descriptions should be the same'
+
+    cached = measure(lambda: [block_params_description(Electrical) for _ in range(200)], 3)
+    legacy = measure(lambda: [legacy_description(Electrical) for _ in range(200)], 3)
+
+    assert cached * 2 < legacy, 'Descriptions should be parsed once per class'